@@ -0,0 +1,239 @@
+import time
+import signal
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from github_issues_config import github_graphql_url, sync_concurrency, job_max_attempts
+from github_issues_store import get_sync_state, set_sync_state, retry_failed_jobs
+from github_issues_client import shutdown_event
+from github_issues_metrics import metrics, configure_logging
+import github_issues_main as sync
+
+# Initial import of a repository with a large history: every issue, open and closed, is read through the github
+# GraphQL API 100 at a time with its body, labels and comment count in one query (instead of a REST page plus
+# per issue requests), and the tasks are created on the worker pool as fast as the clickup rate budget allows.
+# Closed issues get completed tasks and no slack notification is sent. Progress is checkpointed after every page
+# in the sync state so an interrupted backfill resumes where it stopped. Issues that fail are skipped and recorded
+# in the checkpoint, the next run tries them again first (with --retry-failed also the ones whose jobs failed for good).
+# The existing github comments are not copied by default, their thread cursors are set so only the comments written
+# after the import are mirrored. With --comments they are read in the same query and posted to the tasks
+# (one clickup request per comment, the longest part of an import under the clickup rate budget).
+#
+#   python github_issues_backfill.py [--repo owner/name] [--restart] [--comments] [--retry-failed]
+
+logger = logging.getLogger(__name__)
+
+ISSUES_QUERY = """
+query($owner: String!, $name: String!, $first: Int!, $after: String, $withComments: Boolean!) {
+  repository(owner: $owner, name: $name) {
+    issues(first: $first, after: $after, orderBy: {field: CREATED_AT, direction: ASC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        id
+        number
+        title
+        body
+        url
+        state
+        updatedAt
+        commentCount: comments { totalCount }
+        commentNodes: comments(first: 50) @include(if: $withComments) {
+          pageInfo { hasNextPage }
+          nodes { databaseId author { login } body updatedAt }
+        }
+        labels(first: 50) { nodes { name } }
+      }
+    }
+  }
+}
+"""
+
+
+def fetch_issues_page(route, after=None, page_size=100, with_comments=False):
+    """Fetches one page of issues of the route through GraphQL,
+    returns (issues in the REST shape, end cursor, has next page, github server time in ISO 8601)"""
+    variables = {
+        'owner': route['github_owner'],
+        'name': route['github_repo'],
+        'first': page_size,
+        'after': after,
+        'withComments': with_comments,
+    }
+    # A query changes nothing, it is retried on 5xx and timeouts like a GET
+    response = sync.github_session.post(github_graphql_url, json={'query': ISSUES_QUERY, 'variables': variables},
+                                        idempotent=True)
+    if response.status_code != 200:
+        logger.warning(f"Failed to fetch issues through GraphQL. Status code: {response.status_code}")
+        response.raise_for_status()
+    data = response.json()
+    if data.get('errors'):
+        raise RuntimeError(f"GitHub GraphQL query failed: {data['errors']}")
+    issues = data['data']['repository']['issues']
+    page_info = issues['pageInfo']
+    return ([rest_issue(node) for node in issues['nodes']], page_info['endCursor'], page_info['hasNextPage'],
+            server_time(response))
+
+
+def server_time(response):
+    """Time of a response by the clock of the server (Date header), the local clock when it has none"""
+    try:
+        moment = parsedate_to_datetime(response.headers['Date'])
+    except (KeyError, TypeError, ValueError):
+        moment = datetime.now(timezone.utc)
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def rest_issue(node):
+    """GraphQL issue node in the shape of a REST issue, with its comments in 'comment_list' when they were read"""
+    issue = {
+        'number': node['number'],
+        'node_id': node['id'],
+        'title': node['title'],
+        'body': node['body'],
+        'html_url': node['url'],
+        'state': node['state'].lower(),
+        'updated_at': node['updatedAt'],
+        'comments': node['commentCount']['totalCount'],
+        'labels': [{'name': label['name']} for label in node['labels']['nodes']],
+    }
+    comment_nodes = node.get('commentNodes')
+    if comment_nodes is None:
+        issue['comment_list'] = []
+    elif not comment_nodes['pageInfo']['hasNextPage']:
+        issue['comment_list'] = [{
+            'id': comment['databaseId'],
+            'user': {'login': (comment['author'] or {}).get('login', 'ghost')},
+            'body': comment['body'],
+            'updated_at': comment['updatedAt'],
+        } for comment in comment_nodes['nodes']]
+    return issue
+
+
+def backfill_route(route, concurrency=None, restart=False, stop_event=None, page_size=100, with_comments=False):
+    """Creates (or adopts / updates) the tasks of every issue of a route, page by page from the checkpoint.
+    Returns True when the whole repository was imported"""
+    concurrency = concurrency or sync_concurrency
+    checkpoint_key = f'backfill:{route["repo"]}'
+    checkpoint = {} if restart else get_sync_state(checkpoint_key, {})
+    if checkpoint.get('done') and not checkpoint.get('failed'):
+        logger.info(f"Backfill of {route['repo']} is already done, use --restart to run it again.")
+        return True
+    checkpoint.setdefault('issues', 0)
+    failed = checkpoint.setdefault('failed', {})
+    valid_status = sync.get_valid_status(route)
+    request_type_custom_field_id = sync.get_request_type_custom_field_id(route)
+    # Tasks that already exist in the list are adopted by title instead of being created again
+    sync.refresh_clickup_task_index(route)
+    stop_event = stop_event or threading.Event()
+
+    def sync_issues(issues):
+        failures = sync.run_bounded(
+            lambda issue: sync.sync_issue(route, issue, valid_status, request_type_custom_field_id, lambda: None,
+                                          backfill=True),
+            sync.until_stopped(issues, stop_event), concurrency
+        )
+        for issue in issues:
+            failed.pop(str(issue['number']), None)
+        for issue, error in failures:
+            logger.warning(f"Failed to backfill issue #{issue['number']} of {route['repo']}, skipping it: {error}")
+            failed[str(issue['number'])] = str(error)
+
+    if failed:
+        logger.info(f"Retrying {len(failed)} issue(s) of {route['repo']} that failed in the last run")
+        issues = []
+        for number in list(failed):
+            issue = sync.fetch_issue_details(route, int(number))
+            if issue is None:
+                failed.pop(number)   # deleted or transferred since
+                continue
+            if not with_comments:
+                issue['comment_list'] = []
+            issues.append(issue)
+        sync_issues(issues)
+        if not stop_event.is_set():
+            set_sync_state(checkpoint_key, checkpoint)
+    started = time.monotonic()
+    synced = 0
+    while not checkpoint.get('done') and not stop_event.is_set():
+        issues, end_cursor, has_next_page, fetched_at = fetch_issues_page(route, checkpoint.get('cursor'), page_size,
+                                                                          with_comments)
+        # github's clock, a host clock running ahead would skip the updates made during the import
+        checkpoint.setdefault('started_at', fetched_at)
+        sync_issues(issues)
+        if stop_event.is_set():
+            break
+        synced += len(issues)
+        checkpoint['cursor'] = end_cursor
+        checkpoint['issues'] += len(issues)
+        checkpoint['done'] = not has_next_page
+        set_sync_state(checkpoint_key, checkpoint)
+        metrics.inc('backfill_issues_total', len(issues), repo=route['repo'])
+        elapsed = time.monotonic() - started
+        logger.info(f"Backfilled {checkpoint['issues']} issues of {route['repo']} ({synced / elapsed:.1f} issues/s)")
+    if stop_event.is_set():
+        # The page may be partly synced, it is gone through again (without duplicates) on the next run
+        logger.info(f"Backfill of {route['repo']} stopped, it resumes from the checkpoint on the next run.")
+        return False
+    # The regular sync continues incrementally from the start of the backfill instead of listing every open issue
+    state_key = f'github_issues:{route["repo"]}'
+    issues_state = get_sync_state(state_key, {})
+    if not issues_state.get('since'):
+        issues_state['since'] = checkpoint['started_at']
+        set_sync_state(state_key, issues_state)
+    if failed:
+        logger.error(f"Backfill of {route['repo']} done, {len(failed)} of {checkpoint['issues']} issues failed: "
+                     f"#{', #'.join(failed)}. Run the backfill again to retry them, with --retry-failed for the ones "
+                     f"whose jobs failed for good.")
+        return False
+    logger.info(f"Backfill of {route['repo']} done, {checkpoint['issues']} issues.")
+    return True
+
+
+def backfill(routes=None, concurrency=None, restart=False, stop_event=None, page_size=100, with_comments=False):
+    """Backfills the routes one after another, holding the sync lease so the regular sync does not run meanwhile"""
+    with sync.sync_lease() as acquired:
+        if not acquired:
+            logger.info("A sync cycle is running, try the backfill again once it is done.")
+            return False
+        done = True
+        for route in routes or sync.sync_routes:
+            try:
+                done = backfill_route(route, concurrency, restart, stop_event, page_size, with_comments) and done
+            except (requests.exceptions.RequestException, RuntimeError) as e:
+                logger.error(f"Backfill of {route['repo']} failed, it resumes from the checkpoint on the next run: {e}")
+                done = False
+        return done
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import every github issue (open and closed) into clickup without notifications')
+    parser.add_argument('--repo', help='only backfill this owner/name route')
+    parser.add_argument('--concurrency', type=int, help='issues synced in parallel (sync_concurrency by default)')
+    parser.add_argument('--page-size', type=int, default=100, help='issues per GraphQL page (at most 100)')
+    parser.add_argument('--comments', action='store_true', help='also copy the existing github comments to the tasks')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help=f'also retry the issues whose jobs failed {job_max_attempts} times')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and go through every issue again')
+    args = parser.parse_args()
+    configure_logging()
+    if args.retry_failed:
+        logger.info(f"Retrying {retry_failed_jobs()} failed job(s)")
+    routes = None
+    if args.repo:
+        route = sync.route_for_repo(args.repo)
+        if route is None:
+            raise SystemExit(f'{args.repo} is not a configured route')
+        routes = [route]
+    stop_event = threading.Event()
+    def stop(signum, frame):
+        logger.info(f"Received signal {signum}, stopping after the issues in flight.")
+        stop_event.set()
+        shutdown_event.set()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    completed = backfill(routes, args.concurrency, args.restart, stop_event, min(max(args.page_size, 1), 100), args.comments)
+    sync.slack_notifier.flush()
+    raise SystemExit(0 if completed else 1)
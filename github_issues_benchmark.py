@@ -0,0 +1,638 @@
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+import email.utils
+import threading
+import multiprocessing
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import requests
+
+try:
+    import resource
+except ImportError:  # not available on windows, peak RSS is not reported there
+    resource = None
+
+# Offline benchmark of the sync: a local mock of the github issues/comments and clickup list/task/attachment/comment
+# endpoints runs in a separate process (so the peak RSS is the one of the sync alone), then full and incremental sync
+# cycles are run against it and the wall time, requests per endpoint, peak RSS and throughput of each cycle are reported.
+#
+#   python github_issues_benchmark.py --issues 5000 --latency 20 --incremental-cycles 3
+#   python github_issues_benchmark.py --mock-only   # just serve the mock, e.g. for the webhook server
+
+MOCK_OWNER = 'bench'
+MOCK_REPO = 'issues'
+MOCK_LIST_ID = '9001'
+MOCK_SPACE_ID = '9002'
+MOCK_FIELD_ID = 'bench-request-type'
+
+# Label sets handed out round robin, p0 and bug issues are urgent/high priority and get attachments and notifications
+LABEL_SETS = [['enhancement'], ['bug'], ['question'], ['p0'], ['task'], []]
+
+BASE_TIME = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def iso_time(seconds):
+    return (BASE_TIME + timedelta(seconds=seconds)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class MockRateLimit:
+    """Fixed window request budget answered with the X-RateLimit-* headers, limit 0 means unlimited"""
+
+    def __init__(self, limit, period):
+        self.limit = limit
+        self.period = period
+        self.window_end = time.time() + period
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Counts one request, returns (allowed, headers)"""
+        if not self.limit:
+            return True, {}
+        with self.lock:
+            now = time.time()
+            if now >= self.window_end:
+                self.window_end = now + self.period
+                self.used = 0
+            allowed = self.used < self.limit
+            if allowed:
+                self.used += 1
+            headers = {
+                'X-RateLimit-Limit': str(self.limit),
+                'X-RateLimit-Remaining': str(self.limit - self.used),
+                'X-RateLimit-Reset': str(int(self.window_end)),
+            }
+        return allowed, headers
+
+    def refund(self):
+        with self.lock:
+            self.used = max(self.used - 1, 0)
+
+
+class MockState:
+    """Generated github issues and the clickup tasks created by the sync, shaped like the REST responses"""
+
+    def __init__(self, options, host):
+        self.options = options
+        self.host = host
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.issues_served = 0
+        # Bumped on every github (version) and clickup (task_version) change, they invalidate the cached list
+        # queries, version is also the issues ETag
+        self.version = 0
+        self.task_version = 0
+        self.clock = options['issues']
+        self.issues = [self.make_issue(number) for number in range(1, options['issues'] + 1)]
+        self.issues_by_number = {issue['number']: issue for issue in self.issues}
+        self.github_comments = {}
+        self.tasks = {}
+        self.task_comments = {}
+        self.next_id = 1
+        self.next_comment_id = 1
+        self.mutated = 0
+        self.filtered = {}
+
+    def tick(self):
+        """Logical clock, every change gets a later updated_at"""
+        self.clock += 1
+        self.version += 1
+        return self.clock
+
+    def make_issue(self, number):
+        body = f'Generated issue {number} for the sync benchmark.'
+        if self.options['image_every'] and number % self.options['image_every'] == 0:
+            image = number % self.options['distinct_images']
+            body += f'\n\n![screenshot](http://{self.host}/img/{image}.png)'
+        return {
+            'number': number,
+            'node_id': f'I_bench_{number}',
+            'title': f'Benchmark issue {number}',
+            'body': body,
+            'html_url': f'https://github.com/{MOCK_OWNER}/{MOCK_REPO}/issues/{number}',
+            'labels': [{'name': name} for name in LABEL_SETS[number % len(LABEL_SETS)]],
+            'state': 'closed' if self.options['closed_every'] and number % self.options['closed_every'] == 0 else 'open',
+            'comments': self.options['comments_per_issue'],
+            'updated_at': iso_time(number),
+        }
+
+    def comments_of(self, number):
+        """Github comments of an issue, the generated ones are only materialized when first asked for"""
+        comments = self.github_comments.get(number)
+        if comments is None:
+            comments = [{
+                'id': number * 1000 + index,
+                'user': {'login': 'octocat'},
+                'body': f'Comment {index} on issue {number}',
+                'updated_at': iso_time(number),
+            } for index in range(self.issues_by_number[number]['comments'])]
+            self.github_comments[number] = comments
+        return comments
+
+    def filtered_issues(self, state, since, sort):
+        """Issues matching a list query, cached until the next change since every page asks for the same list"""
+        key = ('issues', state, since, sort, self.version)
+        items = self.filtered.get(key)
+        if items is None:
+            items = [issue for issue in self.issues
+                     if (state == 'all' or issue['state'] == state) and (not since or issue['updated_at'] >= since)]
+            if sort == 'updated':
+                items.sort(key=lambda issue: issue['updated_at'])
+            self.filtered = {key: items}
+        return items
+
+    def filtered_tasks(self, list_id, date_updated_gt, include_closed):
+        key = ('tasks', list_id, date_updated_gt, include_closed, self.task_version)
+        items = self.filtered.get(key)
+        if items is None:
+            items = [task for task in self.tasks.values()
+                     if task['list']['id'] == list_id and int(task['date_updated']) > date_updated_gt
+                     and (include_closed or task['status']['status'] != 'complete')]
+            self.filtered = {key: items}
+        return items
+
+    def mutate(self, count):
+        """Changes `count` issues the way users do between two cycles: edited titles, new comments, relabels and
+        closes in turn, and adds a clickup comment to one task in four"""
+        changed = []
+        with self.lock:
+            open_issues = [issue for issue in self.issues if issue['state'] == 'open']
+            for index in range(min(count, len(open_issues))):
+                issue = open_issues[(self.mutated + index * 7) % len(open_issues)]
+                kind = (self.mutated + index) % 4
+                if kind == 0:
+                    issue['title'] += ' (edited)'
+                elif kind == 1:
+                    comments = self.comments_of(issue['number'])
+                    comments.append({'id': issue['number'] * 1000 + len(comments), 'user': {'login': 'octocat'},
+                                     'body': 'A new comment', 'updated_at': iso_time(self.clock + 1)})
+                    issue['comments'] += 1
+                elif kind == 2:
+                    issue['labels'] = [{'name': 'bug'}]
+                else:
+                    issue['state'] = 'closed'
+                issue['updated_at'] = iso_time(self.tick())
+                changed.append(issue['number'])
+            self.mutated += len(changed)
+            tasks = list(self.tasks.values())
+            for task in tasks[:len(changed) // 4]:
+                self.add_task_comment(task['id'], 'A comment from clickup', 'clickup-user')
+        return changed
+
+    def add_task_comment(self, task_id, text, username):
+        comment = {
+            'id': str(self.next_comment_id),
+            'comment_text': text,
+            'user': {'username': username},
+            'date': str(int(time.time() * 1000)),
+        }
+        self.next_comment_id += 1
+        self.task_comments.setdefault(task_id, []).append(comment)
+        self.touch_task(self.tasks[task_id])
+        return comment
+
+    def touch_task(self, task):
+        self.task_version += 1
+        task['date_updated'] = str(max(int(time.time() * 1000), int(task['date_updated']) + 1))
+
+
+def make_handler(state, options):
+    github_limit = MockRateLimit(options['github_limit'], 3600)
+    clickup_limit = MockRateLimit(options['clickup_limit'], 60)
+    routes = []
+
+    def route(method, pattern, name):
+        def register(handler):
+            routes.append((method, re.compile(pattern + '$'), name, handler))
+            return handler
+        return register
+
+    issues_path = f'/repos/{MOCK_OWNER}/{MOCK_REPO}/issues'
+
+    @route('GET', issues_path, 'GET /repos/{owner}/{repo}/issues')
+    def list_issues(request, query, match):
+        per_page = int(query.get('per_page', 30))
+        page = int(query.get('page', 1))
+        since = query.get('since')
+        with state.lock:
+            items = state.filtered_issues(query.get('state', 'open'), since, query.get('sort'))
+            etag = f'"{state.version}-{query.get("state", "open")}-{since}"'
+            if page == 1 and request.headers.get('If-None-Match') == etag:
+                github_limit.refund()   # conditional requests that are not modified are free on github
+                return 304, None, {}
+            chunk = items[(page - 1) * per_page:page * per_page]
+            state.issues_served += len(chunk)
+        headers = {'ETag': etag}
+        if page * per_page < len(items):
+            next_query = dict(query, page=page + 1)
+            next_url = f'http://{state.host}{issues_path}?' + '&'.join(f'{key}={value}' for key, value in next_query.items())
+            headers['Link'] = f'<{next_url}>; rel="next"'
+        return 200, chunk, headers
+
+    @route('GET', issues_path + r'/(\d+)', 'GET /repos/{owner}/{repo}/issues/{number}')
+    def get_issue(request, query, match):
+        return 200, state.issues_by_number[int(match.group(1))], {}
+
+    @route('GET', issues_path + r'/(\d+)/comments', 'GET /repos/{owner}/{repo}/issues/{number}/comments')
+    def list_issue_comments(request, query, match):
+        since = query.get('since')
+        with state.lock:
+            comments = [comment for comment in state.comments_of(int(match.group(1)))
+                        if not since or comment['updated_at'] >= since]
+        return 200, comments, {}
+
+    @route('POST', issues_path + r'/(\d+)/comments', 'POST /repos/{owner}/{repo}/issues/{number}/comments')
+    def add_issue_comment(request, query, match):
+        body = json.loads(request.body)
+        with state.lock:
+            issue = state.issues_by_number[int(match.group(1))]
+            comments = state.comments_of(issue['number'])
+            comment = {'id': issue['number'] * 1000 + len(comments), 'user': {'login': 'sync-bot'},
+                       'body': body['body'], 'updated_at': iso_time(state.tick())}
+            comments.append(comment)
+            issue['comments'] += 1
+            issue['updated_at'] = comment['updated_at']
+        return 201, comment, {}
+
+    @route('POST', r'/graphql', 'POST /graphql')
+    def graphql(request, query, match):
+        # Only the paged issues query of the backfill, the cursor is the offset in creation order
+        variables = json.loads(request.body)['variables']
+        offset = int(variables.get('after') or 0)
+        with state.lock:
+            chunk = state.issues[offset:offset + variables['first']]
+            state.issues_served += len(chunk)
+            nodes = [{
+                'id': issue['node_id'],
+                'number': issue['number'],
+                'title': issue['title'],
+                'body': issue['body'],
+                'url': issue['html_url'],
+                'state': issue['state'].upper(),
+                'updatedAt': issue['updated_at'],
+                'commentCount': {'totalCount': issue['comments']},
+                'labels': {'nodes': list(issue['labels'])},
+            } for issue in chunk]
+            if variables.get('withComments'):
+                for node in nodes:
+                    comments = state.comments_of(node['number'])
+                    node['commentNodes'] = {'pageInfo': {'hasNextPage': len(comments) > 50}, 'nodes': [{
+                        'databaseId': comment['id'],
+                        'author': {'login': comment['user']['login']},
+                        'body': comment['body'],
+                        'updatedAt': comment['updated_at'],
+                    } for comment in comments[:50]]}
+        end = offset + len(chunk)
+        page_info = {'hasNextPage': end < len(state.issues), 'endCursor': str(end)}
+        return 200, {'data': {'repository': {'issues': {'pageInfo': page_info, 'nodes': nodes}}}}, {}
+
+    @route('GET', r'/api/v2/list/(\w+)', 'GET /list/{list_id}')
+    def get_list(request, query, match):
+        return 200, {'id': match.group(1), 'statuses': [{'status': 'to do'}, {'status': 'in progress'}, {'status': 'complete'}]}, {}
+
+    @route('GET', r'/api/v2/space/(\w+)/field', 'GET /space/{space_id}/field')
+    def get_space_fields(request, query, match):
+        options = [{'id': f'bench-option-{name}', 'name': name} for name in ('bug', 'enhancement', 'question', 'task')]
+        return 200, {'fields': [{'id': MOCK_FIELD_ID, 'name': 'Request Type', 'type_config': {'options': options}}]}, {}
+
+    @route('GET', r'/api/v2/list/(\w+)/task', 'GET /list/{list_id}/task')
+    def list_tasks(request, query, match):
+        page = int(query.get('page', 0))
+        with state.lock:
+            tasks = state.filtered_tasks(match.group(1), int(query.get('date_updated_gt') or 0),
+                                         query.get('include_closed') == 'true')
+            chunk = tasks[page * 100:(page + 1) * 100]
+        return 200, {'tasks': chunk, 'last_page': (page + 1) * 100 >= len(tasks)}, {}
+
+    @route('POST', r'/api/v2/list/(\w+)/task', 'POST /list/{list_id}/task')
+    def create_task(request, query, match):
+        body = json.loads(request.body)
+        with state.lock:
+            task_id = f'bench{state.next_id}'
+            state.next_id += 1
+            task = {
+                'id': task_id,
+                'name': body['name'],
+                'url': f'https://app.clickup.com/t/{task_id}',
+                'status': {'status': body.get('status') or 'to do'},
+                'priority': {'id': str(body['priority'])} if body.get('priority') else None,
+                'list': {'id': match.group(1)},
+                'date_updated': '0',
+            }
+            state.tasks[task_id] = task
+            state.touch_task(task)
+        return 200, task, {}
+
+    @route('GET', r'/api/v2/task/(\w+)', 'GET /task/{task_id}')
+    def get_task(request, query, match):
+        return 200, state.tasks[match.group(1)], {}
+
+    @route('PUT', r'/api/v2/task/(\w+)', 'PUT /task/{task_id}')
+    def update_task(request, query, match):
+        body = json.loads(request.body)
+        with state.lock:
+            task = state.tasks[match.group(1)]
+            if 'name' in body:
+                task['name'] = body['name']
+            if 'status' in body:
+                task['status'] = {'status': body['status']}
+            state.touch_task(task)
+        return 200, task, {}
+
+    @route('POST', r'/api/v2/task/(\w+)/field/([\w-]+)', 'POST /task/{task_id}/field/{field_id}')
+    def set_custom_field(request, query, match):
+        return 200, {}, {}
+
+    @route('POST', r'/api/v2/task/(\w+)/attachment', 'POST /task/{task_id}/attachment')
+    def upload_attachment(request, query, match):
+        return 200, {'id': f'attachment-{len(request.body)}'}, {}
+
+    @route('GET', r'/api/v2/task/(\w+)/comment', 'GET /task/{task_id}/comment')
+    def list_task_comments(request, query, match):
+        with state.lock:
+            comments = sorted(state.task_comments.get(match.group(1), []), key=lambda comment: -int(comment['date']))
+        if 'start' in query:
+            comments = [comment for comment in comments if int(comment['date']) < int(query['start'])]
+        return 200, {'comments': comments[:25]}, {}
+
+    @route('POST', r'/api/v2/task/(\w+)/comment', 'POST /task/{task_id}/comment')
+    def add_task_comment(request, query, match):
+        body = json.loads(request.body)
+        with state.lock:
+            comment = state.add_task_comment(match.group(1), body['comment_text'], 'sync-bot')
+        return 200, {'id': comment['id'], 'date': int(comment['date'])}, {}
+
+    @route('GET', r'/img/(\d+)\.png', 'GET /img/{image}')
+    def get_image(request, query, match):
+        data = b'\x89PNG\r\n\x1a\n' + match.group(1).encode('utf-8') * (options['image_bytes'] // len(match.group(1)))
+        return 200, data, {'Content-Type': 'image/png'}
+
+    @route('POST', r'/slack', 'POST /slack')
+    def post_slack(request, query, match):
+        return 200, b'ok', {'Content-Type': 'text/plain'}
+
+    @route('GET', r'/_stats', None)
+    def get_stats(request, query, match):
+        with state.lock:
+            return 200, {'counts': dict(state.counts), 'issues_served': state.issues_served, 'tasks': len(state.tasks)}, {}
+
+    @route('POST', r'/_reset', None)
+    def reset_stats(request, query, match):
+        with state.lock:
+            state.counts.clear()
+            state.issues_served = 0
+        return 200, {}, {}
+
+    @route('POST', r'/_mutate', None)
+    def mutate(request, query, match):
+        return 200, {'changed': state.mutate(int(query.get('count', 0)))}, {}
+
+    class MockHandler(BaseHTTPRequestHandler):
+        # Keep-alive, so the connection pools of the sync sessions are exercised like against the real services
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are separate writes, with Nagle every response would wait for the delayed ack
+        disable_nagle_algorithm = True
+
+        def handle_request(self, method):
+            url = urlparse(self.path)
+            query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+            self.body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            for route_method, pattern, name, handler in routes:
+                match = pattern.match(url.path)
+                if route_method != method or not match:
+                    continue
+                if name is None:
+                    return self.reply(*handler(self, query, match))
+                with state.lock:
+                    state.counts[name] += 1
+                if options['latency']:
+                    time.sleep(options['latency'])
+                if url.path.startswith(('/repos/', '/graphql')):
+                    allowed, limit_headers = github_limit.take()
+                    limited_status = 403
+                elif url.path.startswith('/api/v2/'):
+                    allowed, limit_headers = clickup_limit.take()
+                    limited_status = 429
+                else:
+                    allowed, limit_headers = True, {}
+                if not allowed:
+                    with state.lock:
+                        state.counts['rate limited'] += 1
+                    return self.reply(limited_status, {'message': 'rate limit exceeded'}, limit_headers)
+                status, body, headers = handler(self, query, match)
+                return self.reply(status, body, dict(limit_headers, **headers))
+            self.reply(404, {'message': f'Not mocked: {method} {url.path}'}, {})
+
+        def date_time_string(self, timestamp=None):
+            """Date header by the clock of the generated data, the backfill takes its since from it"""
+            with state.lock:
+                moment = BASE_TIME + timedelta(seconds=state.clock)
+            return email.utils.formatdate(moment.timestamp(), usegmt=True)
+
+        def reply(self, status, body, headers):
+            if isinstance(body, bytes):
+                data = body
+            else:
+                data = json.dumps(body).encode('utf-8') if body is not None else b''
+                headers = dict(headers, **{'Content-Type': 'application/json'})
+            self.send_response(status)
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self.handle_request('GET')
+
+        def do_POST(self):
+            self.handle_request('POST')
+
+        def do_PUT(self):
+            self.handle_request('PUT')
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockHandler
+
+
+def serve_mock(options, port=0, ready=None):
+    """Runs the mock server until the process is stopped, the base url is put on the `ready` queue once it listens"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), BaseHTTPRequestHandler)
+    server.daemon_threads = True
+    host = f'127.0.0.1:{server.server_address[1]}'
+    server.RequestHandlerClass = make_handler(MockState(options, host), options)
+    if ready is not None:
+        ready.put(f'http://{host}')
+    else:
+        print(f'Mock github/clickup server listening on http://{host}/')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def start_mock(options):
+    """Starts the mock server in its own process and returns (process, base_url)"""
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve_mock, args=(options, 0, ready), daemon=True)
+    process.start()
+    return process, ready.get(timeout=60)
+
+
+def configure_environment(base_url, work_dir, args):
+    """Points the sync at the mock, has to run before github_issues_config is imported"""
+    os.environ.update({
+        'github_api_base': base_url,
+        'github_graphql_url': f'{base_url}/graphql',
+        'clickup_api_url': f'{base_url}/api/v2',
+        'github_owner': MOCK_OWNER,
+        'github_repo': MOCK_REPO,
+        'github_personal_access_token': 'benchmark',
+        'clickup_api_key': 'benchmark',
+        'clickup_list_id': MOCK_LIST_ID,
+        'clickup_space_id': MOCK_SPACE_ID,
+        'request_type_custom_field_id': '',
+        'slack_webhook_url': f'{base_url}/slack',
+        'slack_digest_window': '0.5',
+        'sync_db_path': os.path.join(work_dir, 'sync.db'),
+        'attachment_cache_dir': os.path.join(work_dir, 'attachments'),
+        'sync_concurrency': str(args.concurrency),
+        'github_rate_limit_per_hour': str(args.client_github_budget),
+        'clickup_rate_limit_per_minute': str(args.client_clickup_budget),
+    })
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on linux, bytes on macos
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_cycle(sync, base_url, label, concurrency, verbose=False, cycle=None):
+    """Runs one sync cycle (or the given cycle function) against the mock and returns its measurements,
+    the output of the sync is dropped unless verbose"""
+    requests.post(f'{base_url}/_reset')
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(sys.stdout if verbose else devnull):
+        started = time.perf_counter()
+        if cycle is not None:
+            cycle()
+        else:
+            sync.sync_github_to_clickup(concurrency=concurrency)
+        sync.slack_notifier.flush()
+        wall_time = time.perf_counter() - started
+    stats = requests.get(f'{base_url}/_stats').json()
+    total_requests = sum(stats['counts'].values())
+    return {
+        'cycle': label,
+        'wall_time': round(wall_time, 3),
+        'issues': stats['issues_served'],
+        'issues_per_second': round(stats['issues_served'] / wall_time, 1) if wall_time else None,
+        'requests': total_requests,
+        'requests_per_second': round(total_requests / wall_time, 1) if wall_time else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1) if resource is not None else None,
+        'tasks': stats['tasks'],
+        'endpoints': dict(sorted(stats['counts'].items())),
+    }
+
+
+def print_report(results):
+    print()
+    print(f"{'cycle':<16}{'wall s':>10}{'issues':>9}{'issues/s':>10}{'requests':>10}{'req/s':>9}{'peak MB':>9}")
+    for result in results:
+        print(f"{result['cycle']:<16}{result['wall_time']:>10}{result['issues']:>9}{result['issues_per_second'] or '-':>10}"
+              f"{result['requests']:>10}{result['requests_per_second'] or '-':>9}{result['peak_rss_mb'] or '-':>9}")
+    for result in results:
+        print(f"\n{result['cycle']} requests per endpoint:")
+        for endpoint, count in result['endpoints'].items():
+            print(f"  {endpoint:<48}{count:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the github to clickup sync against a local mock server')
+    parser.add_argument('--issues', type=int, default=1000, help='number of generated github issues (100 to 50000)')
+    parser.add_argument('--comments-per-issue', type=int, default=1, help='github comments of every issue')
+    parser.add_argument('--image-every', type=int, default=7, help='one issue in N has an image, 0 for none')
+    parser.add_argument('--closed-every', type=int, default=0, help='one issue in N is closed, 0 for none')
+    parser.add_argument('--distinct-images', type=int, default=20, help='number of different image urls')
+    parser.add_argument('--image-bytes', type=int, default=20000, help='size of the mocked images')
+    parser.add_argument('--latency', type=float, default=0, help='milliseconds added to every mocked request')
+    parser.add_argument('--github-limit', type=int, default=0, help='mocked github requests per hour, 0 is unlimited')
+    parser.add_argument('--clickup-limit', type=int, default=0, help='mocked clickup requests per minute, 0 is unlimited')
+    parser.add_argument('--client-github-budget', type=int, default=10 ** 9,
+                        help='github_rate_limit_per_hour of the sync (unlimited by default to measure the sync itself)')
+    parser.add_argument('--client-clickup-budget', type=int, default=10 ** 9,
+                        help='clickup_rate_limit_per_minute of the sync')
+    parser.add_argument('--concurrency', type=int, default=4, help='sync_concurrency of the sync')
+    parser.add_argument('--incremental-cycles', type=int, default=2, help='incremental cycles after the full one')
+    parser.add_argument('--change-rate', type=float, default=0.01, help='share of the issues changed before each incremental cycle')
+    parser.add_argument('--backfill', action='store_true',
+                        help='import the issues with the GraphQL backfill instead of a full sync cycle')
+    parser.add_argument('--backfill-comments', action='store_true',
+                        help='copy the existing github comments in the backfill')
+    parser.add_argument('--verbose', action='store_true', help='show the output of the sync, with its debug log')
+    parser.add_argument('--json', metavar='PATH', help='also write the results as json to PATH')
+    parser.add_argument('--mock-only', action='store_true', help='only serve the mock server (on --port) until interrupted')
+    parser.add_argument('--port', type=int, default=8098, help='port of the mock server with --mock-only')
+    args = parser.parse_args()
+
+    options = {
+        'issues': args.issues,
+        'comments_per_issue': args.comments_per_issue,
+        'image_every': args.image_every,
+        'closed_every': args.closed_every,
+        'distinct_images': max(args.distinct_images, 1),
+        'image_bytes': args.image_bytes,
+        'latency': args.latency / 1000,
+        'github_limit': args.github_limit,
+        'clickup_limit': args.clickup_limit,
+    }
+    if args.mock_only:
+        serve_mock(options, args.port)
+        return
+
+    process, base_url = start_mock(options)
+    work_dir = tempfile.mkdtemp(prefix='github_issues_benchmark_')
+    try:
+        configure_environment(base_url, work_dir, args)
+        import github_issues_main as sync
+        from github_issues_metrics import configure_logging
+        configure_logging('DEBUG' if args.verbose else 'WARNING')
+
+        if args.backfill:
+            import github_issues_backfill
+            results = [run_cycle(sync, base_url, 'backfill', args.concurrency, args.verbose,
+                                 lambda: github_issues_backfill.backfill(concurrency=args.concurrency,
+                                                                                with_comments=args.backfill_comments))]
+        else:
+            results = [run_cycle(sync, base_url, 'full', args.concurrency, args.verbose)]
+        results.append(run_cycle(sync, base_url, 'idle', args.concurrency, args.verbose))
+        for cycle in range(1, args.incremental_cycles + 1):
+            count = max(1, int(args.issues * args.change_rate))
+            requests.post(f'{base_url}/_mutate', params={'count': count})
+            results.append(run_cycle(sync, base_url, f'incremental {cycle}', args.concurrency, args.verbose))
+        print_report(results)
+        if args.json:
+            with open(args.json, 'w') as json_file:
+                json.dump({'options': vars(args), 'results': results}, json_file, indent=2)
+    finally:
+        process.terminate()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+import time
+import uuid
+import random
+import logging
+import threading
+import requests
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from github_issues_config import (
+    github_personal_access_token, clickup_api_key, http_timeout, http_pool_size,
+    http_max_retries, github_rate_limit_per_hour, clickup_rate_limit_per_minute, trace_requests
+)
+from github_issues_metrics import metrics, log_event, endpoint_template
+
+# Shared HTTP sessions, one per service, so a sync cycle reuses a few keep-alive connections
+# instead of opening a new TCP + TLS connection for every request
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS'}
+MAX_BACKOFF = 60
+
+# Set when the process is stopping: waiting for a rate limit or a retry (up to an hour on an exhausted github budget)
+# raises RequestsStopped instead, so the work in flight ends within a container stop timeout
+shutdown_event = threading.Event()
+
+
+class RequestsStopped(requests.exceptions.RequestException):
+    """A request that was not sent or retried because the process is stopping"""
+
+
+class RateLimiter:
+    """Token bucket shared by every request to one service, tightened from the X-RateLimit-* response headers"""
+
+    def __init__(self, limit, period):
+        self.base_rate = limit / period
+        self.capacity = limit
+        self.tokens = float(limit)
+        self.fill_rate = self.base_rate
+        self.updated = time.monotonic()
+        self.reset_at = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, stop_event=None):
+        """Blocks until a request may be sent, raises RequestsStopped when stop_event is set while waiting"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if self.reset_at and now >= self.reset_at:
+                    # The server window rolled over, go back to the configured budget
+                    self.reset_at = 0
+                    self.fill_rate = self.base_rate
+                    self.tokens = max(self.tokens, 1.0)
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                if self.fill_rate > 0:
+                    delay = (1 - self.tokens) / self.fill_rate
+                else:
+                    delay = self.reset_at - now
+                if self.reset_at:
+                    delay = min(delay, self.reset_at - now)
+            if stop_event is None:
+                time.sleep(max(delay, 0.01))
+            elif stop_event.wait(max(delay, 0.01)):
+                raise RequestsStopped('Rate limited, not waiting since the process is stopping')
+
+    def update(self, response):
+        """Adjusts the bucket to the remaining budget reported by the server"""
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        if remaining is None or reset is None:
+            return
+        try:
+            remaining = int(remaining)
+            seconds_left = max(float(reset) - time.time(), 0)
+        except ValueError:
+            return
+        with self.lock:
+            self.tokens = min(self.tokens, remaining)
+            if seconds_left:
+                self.reset_at = time.monotonic() + seconds_left
+                self.fill_rate = min(self.base_rate, remaining / seconds_left)
+
+    def seconds_until_available(self, share):
+        """Seconds until `share` (0 to 1) of the budget is available again, 0 when it already is"""
+        with self.lock:
+            now = time.monotonic()
+            tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+            missing = share * self.capacity - tokens
+            if missing <= 0:
+                return 0
+            wait = missing / self.fill_rate if self.fill_rate > 0 else float('inf')
+            if self.reset_at:
+                # The whole budget is back when the server window resets
+                wait = min(wait, max(self.reset_at - now, 0))
+            return wait
+
+    def block_for(self, seconds):
+        """Stops every request to this service for the given time (429 / Retry-After)"""
+        with self.lock:
+            self.tokens = min(self.tokens, 0)
+            self.fill_rate = 0
+            self.reset_at = max(self.reset_at, time.monotonic() + seconds)
+
+
+def retry_delay(response, attempt):
+    """Seconds to wait before retrying: Retry-After, then the rate limit reset time, then jittered exponential backoff"""
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        if response.headers.get('X-RateLimit-Remaining') == '0' and response.headers.get('X-RateLimit-Reset'):
+            try:
+                return max(float(response.headers['X-RateLimit-Reset']) - time.time(), 1)
+            except ValueError:
+                pass
+    return random.uniform(0, min(MAX_BACKOFF, 2 ** attempt))
+
+
+def should_retry(idempotent, response):
+    """429, 503 and rate limited github 403 are retried for every request, other 5xx only for idempotent ones"""
+    if response.status_code in (429, 503):
+        return True
+    if response.status_code == 403:
+        return 'Retry-After' in response.headers or response.headers.get('X-RateLimit-Remaining') == '0'
+    return response.status_code >= 500 and idempotent
+
+
+class MultipartFileBody:
+    """multipart/form-data body with a single file part that is streamed from the file object, pass it as `data`"""
+
+    def __init__(self, field_name, filename, fileobj, size, file_content_type):
+        boundary = uuid.uuid4().hex
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+        self.head = (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{filename}"\r\n'
+            f'Content-Type: {file_content_type}\r\n\r\n'
+        ).encode('utf-8')
+        self.tail = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        self.fileobj = fileobj
+        self.length = len(self.head) + size + len(self.tail)
+        self.seek(0)
+
+    def __len__(self):
+        return self.length
+
+    def seek(self, offset, whence=0):
+        """Only rewinding is supported, used to resend the body on a retry"""
+        self.fileobj.seek(0)
+        self.parts = [self.head, None, self.tail]
+
+    def read(self, size=-1):
+        while self.parts:
+            part = self.parts[0]
+            if part is None:
+                chunk = self.fileobj.read(size if size and size > 0 else -1)
+                if chunk:
+                    return chunk
+                self.parts.pop(0)
+                continue
+            if size is None or size < 0 or size >= len(part):
+                self.parts.pop(0)
+            else:
+                self.parts[0] = part[size:]
+                part = part[:size]
+            if part:
+                return part
+        return b''
+
+
+class ClientSession(requests.Session):
+    """requests.Session with a sized connection pool, a default timeout, rate limiting, retries and metrics.
+    `idempotent=True` marks a POST that is safe to retry, waits raise RequestsStopped once stop_event is set"""
+
+    def __init__(self, headers=None, timeout=http_timeout, pool_size=http_pool_size,
+                 rate_limiter=None, max_retries=http_max_retries, service='http', templated_endpoints=False,
+                 stop_event=shutdown_event):
+        super().__init__()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self.headers.update(headers or {})
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.service = service
+        self.templated_endpoints = templated_endpoints
+        self.stop_event = stop_event
+
+    def record(self, method, endpoint, status, seconds, attempt):
+        metrics.inc('http_requests_total', service=self.service, method=method, endpoint=endpoint, status=status)
+        metrics.observe('http_request_duration_seconds', seconds, service=self.service, method=method, endpoint=endpoint)
+        if trace_requests:
+            log_event('http_request', service=self.service, method=method, endpoint=endpoint, status=status,
+                      duration=round(seconds, 4), attempt=attempt)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        method = method.upper()
+        idempotent = kwargs.pop('idempotent', method in IDEMPOTENT_METHODS)
+        endpoint = endpoint_template(urlsplit(url).path) if self.templated_endpoints else ''
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                waiting_since = time.monotonic()
+                self.rate_limiter.acquire(self.stop_event)
+                metrics.observe('rate_limit_wait_seconds', time.monotonic() - waiting_since, service=self.service)
+            if attempt and hasattr(kwargs.get('data'), 'seek'):
+                # Streamed bodies were consumed by the failed attempt
+                kwargs['data'].seek(0)
+            started = time.monotonic()
+            try:
+                response = super().request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.record(method, endpoint, type(e).__name__, time.monotonic() - started, attempt)
+                if not idempotent or attempt >= self.max_retries:
+                    raise
+                delay = retry_delay(None, attempt)
+                metrics.inc('http_retries_total', service=self.service, reason=type(e).__name__)
+                logger.debug(f"{method} {url} failed ({e}), retrying in {delay:.1f}s")
+            else:
+                self.record(method, endpoint, response.status_code, time.monotonic() - started, attempt)
+                remaining = response.headers.get('X-RateLimit-Remaining', '')
+                if remaining.isdigit():
+                    metrics.set('rate_limit_remaining', int(remaining), service=self.service)
+                if self.rate_limiter:
+                    self.rate_limiter.update(response)
+                if not should_retry(idempotent, response) or attempt >= self.max_retries:
+                    return response
+                delay = retry_delay(response, attempt)
+                response.close()
+                if self.rate_limiter and response.status_code in (403, 429):
+                    self.rate_limiter.block_for(delay)
+                metrics.inc('http_retries_total', service=self.service, reason=response.status_code)
+                logger.debug(f"{method} {url} returned {response.status_code}, retrying in {delay:.1f}s")
+            attempt += 1
+            if self.stop_event is None:
+                time.sleep(delay)
+            elif self.stop_event.wait(delay):
+                raise RequestsStopped(f'{method} {url} not retried, the process is stopping')
+
+
+github_rate_limiter = RateLimiter(github_rate_limit_per_hour, 3600)
+clickup_rate_limiter = RateLimiter(clickup_rate_limit_per_minute, 60)
+
+github_session = ClientSession({
+    "Authorization": f'token {github_personal_access_token}',
+    "Accept": "application/vnd.github+json"
+}, rate_limiter=github_rate_limiter, service='github', templated_endpoints=True)
+
+# No Content-Type here, requests sets it for json bodies and multipart uploads
+clickup_session = ClientSession({
+    "Authorization": clickup_api_key
+}, rate_limiter=clickup_rate_limiter, service='clickup', templated_endpoints=True)
+
+# Incoming webhooks accept about one message per second, the digests queued before a stop are still delivered
+slack_session = ClientSession(rate_limiter=RateLimiter(1, 1), service='slack', stop_event=None)
+
+# Image downloads from issue bodies (github user content, external hosts)
+download_session = ClientSession(service='download')
@@ -20,6 +20,89 @@ clickup_space_id = os.getenv('clickup_space_id')
 slack_webhook_url = os.getenv('slack_webhook_url')
 request_type_custom_field_id = os.getenv('request_type_custom_field_id')
 
+# Metrics in the prometheus text format on http://<host>:metrics_port/metrics (0 disables the endpoint),
+# metrics_file gets one JSON line per sync cycle and, with trace_requests, one per HTTP request.
+# debug_dumps prints the full body of every created task.
+# log_level of the python logging output, per issue and per request messages are only logged at DEBUG
+metrics_port = int(os.getenv('metrics_port') or 0)
+metrics_file = os.getenv('metrics_file')
+trace_requests = (os.getenv('trace_requests') or '').lower() in ('1', 'true', 'yes')
+debug_dumps = (os.getenv('debug_dumps') or '').lower() in ('1', 'true', 'yes')
+log_level = (os.getenv('log_level') or 'INFO').upper()
+
+# API base urls, only changed to point the sync at a mock server (github_issues_benchmark.py)
+github_api_base = os.getenv('github_api_base') or 'https://api.github.com'
+clickup_api_url = os.getenv('clickup_api_url') or 'https://api.clickup.com/api/v2'
+github_graphql_url = os.getenv('github_graphql_url') or f'{github_api_base}/graphql'
+
+# Repo -> list routes synced by one process, from the "routes" of the json config. Each route has github_owner,
+# github_repo, clickup_list_id, clickup_space_id and optionally request_type_custom_field_id.
+# Without routes the single repo and list of the .env are synced
+routes = config.get('routes') or [{
+    'github_owner': github_owner,
+    'github_repo': github_repo,
+    'clickup_list_id': clickup_list_id,
+    'clickup_space_id': clickup_space_id,
+    'request_type_custom_field_id': request_type_custom_field_id,
+}]
+
+# Local SQLite store for the issue to task mapping and the sync state (high-water mark, ETag)
+sync_db_path = os.getenv('sync_db_path') or 'github_issues_sync.db'
+
+# Attempts before a queued job (create task, attachment, notification, comment) is left as failed
+job_max_attempts = int(os.getenv('job_max_attempts') or 5)
+# Seconds a running job stays claimed by its worker, after that it is taken over as the job of a crashed process.
+# A worker that finds a job running in another worker waits job_wait_seconds at most, then its issue fails
+# and is retried on the next cycle
+job_claim_seconds = int(os.getenv('job_claim_seconds') or 600)
+job_wait_seconds = float(os.getenv('job_wait_seconds') or 30)
+
+# Seconds the clickup list statuses and custom field definitions are cached in the local store
+metadata_cache_ttl = int(os.getenv('metadata_cache_ttl') or 3600)
+
+# Number of issues synced in parallel (1 syncs the issues one after another)
+sync_concurrency = int(os.getenv('sync_concurrency') or 4)
+
+# HTTP client settings, timeout in seconds and connections kept alive per service
+http_timeout = float(os.getenv('http_timeout') or 30)
+http_pool_size = int(os.getenv('http_pool_size') or max(sync_concurrency, 10))
+http_max_retries = int(os.getenv('http_max_retries') or 5)
+
+# Request budgets per token, requests are paced to stay under them (github: per hour, clickup: per minute)
+github_rate_limit_per_hour = int(os.getenv('github_rate_limit_per_hour') or 5000)
+clickup_rate_limit_per_minute = int(os.getenv('clickup_rate_limit_per_minute') or 100)
+
+# Slack notifications arriving within slack_digest_window seconds are sent as one digest message
+slack_digest_window = float(os.getenv('slack_digest_window') or 10)
+slack_delivery_retries = int(os.getenv('slack_delivery_retries') or 3)
+
+# Issue image attachments: images over the size limit or with a non image content type are skipped,
+# downloaded images are kept by sha256 in the cache directory, the least recently used ones are removed over
+# attachment_cache_max_bytes, and uploaded attachment_concurrency at a time
+max_attachment_bytes = int(os.getenv('max_attachment_bytes') or 10 * 1024 * 1024)
+attachment_cache_dir = os.getenv('attachment_cache_dir') or '.attachment_cache'
+attachment_cache_max_bytes = int(os.getenv('attachment_cache_max_bytes') or 256 * 1024 * 1024)
+attachment_concurrency = int(os.getenv('attachment_concurrency') or 4)
+
+# Daemon mode (github_issues_main.py --daemon): the poll interval halves after a cycle that saw changes and doubles
+# after an idle one, between poll_interval_min and poll_interval_max seconds, and is stretched until poll_min_budget
+# (share) of the github and clickup rate budgets is available again
+poll_interval_min = float(os.getenv('poll_interval_min') or 60)
+poll_interval_max = float(os.getenv('poll_interval_max') or 4 * 3600)
+poll_min_budget = float(os.getenv('poll_min_budget') or 0.2)
+
+# Incremental cycles only fetch the issues updated since the last one, the open issues are listed again (with their
+# own ETag) every open_issues_check_hours to complete the tasks of deleted and transferred issues
+open_issues_check_hours = float(os.getenv('open_issues_check_hours') or 1)
+
+# Seconds of the store lease a sync cycle holds so two processes never sync at once, renewed while the cycle runs
+sync_lease_seconds = int(os.getenv('sync_lease_seconds') or 300)
+
+# Webhook receiver (github_issues_webhook.py), the full sync runs at startup and every reconcile_interval_hours as a fallback
+github_webhook_secret = os.getenv('github_webhook_secret')
+webhook_port = int(os.getenv('webhook_port') or 8080)
+reconcile_interval_hours = float(os.getenv('reconcile_interval_hours') or 24)
+
 # Request type IDs
 label_to_request_type_id = config.get('label_to_request_type_id', {
     'bug': 'bb6de1dc-da65-4a85-9d0e-5065919fede5',          # request type id for bug
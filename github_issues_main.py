@@ -2,14 +2,37 @@ import requests
 import os
 import re
 import json
+import hashlib
 import time
-import schedule
+import tempfile
+import signal
+import socket
+import mimetypes
 import logging
+import argparse
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from github_issues_config import (
-    github_personal_access_token, github_owner, github_repo,
-    clickup_api_key, clickup_list_id, clickup_space_id,
-    request_type_custom_field_id, label_to_request_type_id ,
-    label_to_priority, slack_webhook_url
+    github_api_base, clickup_api_url, routes, label_to_request_type_id ,
+    label_to_priority, sync_concurrency, job_max_attempts, job_claim_seconds, job_wait_seconds,
+    max_attachment_bytes, attachment_cache_dir, attachment_cache_max_bytes, attachment_concurrency, metadata_cache_ttl,
+    metrics_port, debug_dumps, poll_interval_min, poll_interval_max, poll_min_budget, sync_lease_seconds,
+    open_issues_check_hours
+)
+from github_issues_client import (
+    github_session, clickup_session, download_session, MultipartFileBody,
+    github_rate_limiter, clickup_rate_limiter, shutdown_event, RequestsStopped
+)
+from github_issues_slack import slack_notifier
+from github_issues_metrics import metrics, log_event, serve_metrics, configure_logging
+from github_issues_store import (
+    get_mapping, get_mapping_by_task_id, save_mapping, set_issue_updated_at, mark_completed, iter_mappings, get_sync_state, set_sync_state,
+    save_clickup_tasks, find_clickup_task_by_name, record_task_write, tasks_changed_in_clickup, mark_task_checked,
+    enqueue_job, get_job, claim_job, complete_job, fail_job, release_job, pending_job_keys, retry_failed_jobs,
+    get_attachment, save_attachment, is_attached, mark_attached,
+    get_cached_metadata, set_cached_metadata, invalidate_metadata, acquire_lease, release_lease
 )
 
 # Environment variables 
@@ -20,18 +43,8 @@ from github_issues_config import (
 # github_owner =         # github repo is also for testing 
 # github_repo =    # repo name
 
-# Github and clickup API URL and Headers 
-github_api_url = f"https://api.github.com/repos/{github_owner}/{github_repo}/issues"   
-github_headers = {
-   "Authorization": f'token {github_personal_access_token}',
-   "Accept": "application/vnd.github+json" 
-}
-
-clickup_api_url = "https://api.clickup.com/api/v2"                                     
-clickup_headers = {
-    "Authorization": clickup_api_key,
-    "Content-Type": 'application/json'
-}
+# Github and clickup API URL (github_api_base, clickup_api_url) come from the config, the auth headers are set
+# on the shared sessions in github_issues_client
 
 # Map of GitHub labels to ClickUp "Request Type" IDs
 # Replace these request type field id with the facets request type ids 
@@ -50,73 +63,338 @@ label_to_priority = {
     'enhancement': 3,  # Normal
 }
 
-#logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+# Request type custom field id used when none is configured and the space has no "Request Type" field
+sync_request_type_custom_field_id = "0f3ee9db-dd7d-4893-80ae-3f2f816043d4"                                         #'c7bcbc1f-d7ee-4355-98d5-8706cf0f9bcc'  # Request type id
 
+# Per issue and per request messages are logged at debug level, failures as warnings and cycles at info level,
+# the entry points configure the level with log_level (configure_logging)
+logger = logging.getLogger(__name__)
 
-def fetch_github_issues():
-    """Fetches github issues and return a list of issues"""
-    response = requests.get(github_api_url, headers=github_headers)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        print(f'Failed to fetch issues. Status code: {response.status_code}')
-        response.raise_for_status()
+def make_route(route_config):
+    """Route of one github repository to one clickup list, `repo` (owner/name) keys its rows in the local store"""
+    route = dict(route_config)
+    route['repo'] = f"{route['github_owner']}/{route['github_repo']}"
+    route.setdefault('request_type_custom_field_id', None)
+    return route
+
+# Every configured route, synced together on the shared sessions and rate limiters
+sync_routes = [make_route(route_config) for route_config in routes]
+
+def route_for_repo(repo):
+    """The route of a github repository (owner/name, case insensitive) or None when it is not synced"""
+    for route in sync_routes:
+        if route['repo'].lower() == (repo or '').lower():
+            return route
+    return None
+
+def github_issues_url(route):
+    return f"{github_api_base}/repos/{route['repo']}/issues"
+
+
+def iter_github_issues(route, params=None, etag_cache=None):
+    """Yields the github issues of a route page by page, with the ETag of etag_cache sent on the first page (a 304 yields nothing and sets not_modified)"""
+    url = github_issues_url(route)
+    params = dict(params or {}, per_page=100)
+    headers = {}
+    if etag_cache is not None and etag_cache.get('etag'):
+        headers['If-None-Match'] = etag_cache['etag']
+    first_page = True
+    while url:
+        response = github_session.get(url, headers=headers, params=params)
+        if response.status_code == 304:
+            logger.debug(f'GitHub issues of {route["repo"]} not modified since last sync.')
+            etag_cache['not_modified'] = True
+            return
+        if response.status_code != 200:
+            logger.warning(f'Failed to fetch issues. Status code: {response.status_code}')
+            response.raise_for_status()
+        if first_page and etag_cache is not None and response.headers.get('ETag'):
+            etag_cache['etag'] = response.headers['ETag']
+        for issue in response.json():
+            yield issue
+        # The next link already carries the query string, conditional headers only apply to the first page
+        url = response.links.get('next', {}).get('url')
+        params = None
+        headers = {}
+        first_page = False
+
+def issues_query_key(params):
+    return '&'.join(f'{name}={value}' for name, value in sorted(params.items()))
+
+def issues_etag_cache(issues_state, name, params):
+    """ETag cache of one issues query of a route (name is 'updates' or 'open'), the ETag is only reused for the same query"""
+    stored = issues_state.get('etags', {}).get(name) or {}
+    return {
+        'name': name,
+        'query': issues_query_key(params),
+        'etag': stored.get('etag') if stored.get('query') == issues_query_key(params) else None,
+    }
+
+def store_issues_etag(issues_state, etag_cache):
+    if etag_cache.get('etag'):
+        issues_state.setdefault('etags', {})[etag_cache['name']] = {'query': etag_cache['query'], 'etag': etag_cache['etag']}
 
 # New function to fetch github issues 
-def fetch_issue_details(issue_number):
-    """Function to fetch the github issue details """
-    url = f"{github_api_url}/{issue_number}"
-    response = requests.get(url, headers=github_headers)
+def fetch_issue_details(route, issue_number):
+    """Function to fetch the github issue details, None when the issue was deleted or transferred"""
+    url = f"{github_issues_url(route)}/{issue_number}"
+    response = github_session.get(url)
     if response.status_code == 200:
         return response.json()
+    elif response.status_code in (404, 410):
+        return None
     else:
-        print(f"Failed to fetch issue details. Status code: {response.status_code}")
+        logger.warning(f"Failed to fetch issue details. Status code: {response.status_code}")
         response.raise_for_status()
 
+# Images in issue bodies: files with an image extension and github's extension less user-attachments links.
+# The extension has to end the path (query, fragment, closing quote / bracket or trailing punctuation follow),
+# so hosts or directories like cdn.png-host.io or docs.gif/ do not cut the url short
+IMAGE_URL_PATTERN = re.compile(
+    r"https?://[^\s()<>\"']+?\.(?:jpg|jpeg|png|gif|webp)(?=[?#)\s\"'<>]|[.,;:!]*(?:[\s)]|$))(?:\?[^\s()<>\"']*)?"
+    r"|https://github\.com/user-attachments/assets/[0-9a-fA-F-]+",
+    re.IGNORECASE
+)
+
 # Function to fetch images from github issues 
 def extract_image_urls(issue_body):
-    urls = re.findall(r"(https?://\S+\.(?:jpg|jpeg|png|gif))", issue_body)
-    return urls
+    """Returns the image urls of an issue body, each url once in order of appearance"""
+    urls = IMAGE_URL_PATTERN.findall(issue_body)
+    return list(dict.fromkeys(urls))
+
+def attachment_blob_path(sha256):
+    return os.path.join(attachment_cache_dir, sha256)
+
+# Uploads of this process using each cached blob, those blobs are never pruned
+_blob_users = Counter()
+_blob_users_lock = threading.Lock()
+
+@contextmanager
+def cached_attachment_blob(image_url):
+    """Downloads an image (download_attachment) and keeps its blob in the cache while the block runs"""
+    while True:
+        attachment = download_attachment(image_url)
+        if attachment is None:
+            yield None
+            return
+        with _blob_users_lock:
+            # The blob may have been pruned right after it was downloaded, it is downloaded again then
+            if os.path.exists(attachment_blob_path(attachment['sha256'])):
+                os.utime(attachment_blob_path(attachment['sha256']))
+                _blob_users[attachment['sha256']] += 1
+                break
+    try:
+        yield attachment
+    finally:
+        with _blob_users_lock:
+            _blob_users[attachment['sha256']] -= 1
+            if not _blob_users[attachment['sha256']]:
+                del _blob_users[attachment['sha256']]
+        prune_attachment_cache()
+
+def prune_attachment_cache():
+    """Removes the least recently used blobs over attachment_cache_max_bytes, the url -> sha256 entries stay"""
+    with _blob_users_lock:
+        blobs = []
+        for entry in os.scandir(attachment_cache_dir):
+            # Downloads in progress are temporary files with other names
+            if len(entry.name) == 64 and entry.name not in _blob_users:
+                stat = entry.stat()
+                blobs.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in blobs)
+        for _, size, path in sorted(blobs):
+            if total <= attachment_cache_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+def download_attachment(image_url):
+    """Streams an image into the attachment cache and returns its cache entry (sha256, content_type, size, filename).
+    None for urls that are gone, not an image or too large, other failures raise so the upload job is retried"""
+    cached = get_attachment(image_url)
+    if cached and cached['sha256'] is None:
+        return None
+    if cached and os.path.exists(attachment_blob_path(cached['sha256'])):
+        return cached
+    os.makedirs(attachment_cache_dir, exist_ok=True)
+    with download_session.get(image_url, stream=True) as response:
+        if response.status_code in (404, 410):
+            logger.debug(f"Skipping attachment {image_url}, it no longer exists ({response.status_code})")
+            save_attachment(image_url, None, None, 0, None)
+            return None
+        if response.status_code != 200:
+            logger.warning(f"Failed to download image {response.status_code}")
+            response.raise_for_status()
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        declared_size = int(response.headers.get('Content-Length') or 0)
+        if not content_type.startswith('image/') or declared_size > max_attachment_bytes:
+            logger.debug(f"Skipping attachment {image_url} ({content_type or 'unknown type'}, {declared_size} bytes)")
+            save_attachment(image_url, None, content_type, declared_size, None)
+            return None
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=attachment_cache_dir)
+        try:
+            with os.fdopen(fd, 'wb') as blob:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    size += len(chunk)
+                    if size > max_attachment_bytes:
+                        logger.debug(f"Skipping attachment {image_url}, larger than {max_attachment_bytes} bytes")
+                        save_attachment(image_url, None, content_type, size, None)
+                        return None
+                    digest.update(chunk)
+                    blob.write(chunk)
+            sha256 = digest.hexdigest()
+            os.replace(tmp_path, attachment_blob_path(sha256))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    filename = os.path.basename(image_url.split('?')[0])
+    if not os.path.splitext(filename)[1]:
+        filename += mimetypes.guess_extension(content_type) or ''
+    save_attachment(image_url, sha256, content_type, size, filename)
+    return get_attachment(image_url)
 
 def upload_image_to_clickup_task(task_id, image_url):
-    image_response = requests.get(image_url)
-    if image_response.status_code == 200:
-        files = {'file': (os.path.basename(image_url), image_response.content)}
+    """Uploads an issue image to the clickup task, streaming it from the attachment cache.
+    The same content is never uploaded twice to one task, even when it is linked from several urls"""
+    cached = get_attachment(image_url)
+    if cached and cached['sha256'] and is_attached(task_id, cached['sha256']):
+        logger.debug(f"Image already attached to task {task_id}.")
+        return
+    with cached_attachment_blob(image_url) as attachment:
+        if attachment is None:
+            return
+        if is_attached(task_id, attachment['sha256']):
+            logger.debug(f"Image already attached to task {task_id}.")
+            return
         upload_url = f"{clickup_api_url}/task/{task_id}/attachment"
-        response = requests.post(upload_url, headers=clickup_headers, files=files)
-        if response.status_code == 200:
-            print("Image uploaded successfully.")
-        else:
-            print(f"Failed to upload image {response.status_code}")
+        with open(attachment_blob_path(attachment['sha256']), 'rb') as blob:
+            body = MultipartFileBody('attachment', attachment['filename'], blob, attachment['size'], attachment['content_type'])
+            response = clickup_session.post(upload_url, data=body, headers={'Content-Type': body.content_type})
+    if response.status_code == 200:
+        note_task_write(task_id, response)
+        mark_attached(task_id, attachment['sha256'])
+        logger.debug(f"Image uploaded to task {task_id}")
     else:
-        print(f"Failed to download image {image_response.status_code}")
+        logger.warning(f"Failed to upload image {response.status_code}")
+        response.raise_for_status()
 
-def fetch_clickup_list_details():
-    """Fetches details of the specified Clickup list"""
-    list_url = f'{clickup_api_url}/list/{clickup_list_id}'
-    response = requests.get(list_url, headers=clickup_headers)
+def fetch_clickup_list_details(route):
+    """Fetches details of the Clickup list of a route"""
+    list_url = f'{clickup_api_url}/list/{route["clickup_list_id"]}'
+    response = clickup_session.get(list_url)
     if response.status_code == 200:
         return response.json()
     else:
-        print(f'Failed to fetch list details. Status code: {response.status_code}')
-        print(f"Response: {response.text}")
+        logger.warning(f'Failed to fetch list details. Status code: {response.status_code}. Response: {response.text}')
         response.raise_for_status()
 
-def fetch_clickup_tasks():
-    """Fetches task from the specified Clickup list and returns a list of tasks"""
-    tasks_url = f'{clickup_api_url}/list/{clickup_list_id}/task'
-    response = requests.get(tasks_url, headers=clickup_headers)
+def iter_clickup_tasks(route, date_updated_gt=None, include_closed=False, statuses=None, subtasks=False):
+    """Yields tasks from the Clickup list of a route page by page until the last page.
+    date_updated_gt (unix time in ms) only returns tasks changed after that moment, statuses restricts the returned statuses"""
+    tasks_url = f'{clickup_api_url}/list/{route["clickup_list_id"]}/task'
+    params = {
+        'include_closed': str(include_closed).lower(),
+        'subtasks': str(subtasks).lower(),
+    }
+    if date_updated_gt:
+        params['date_updated_gt'] = date_updated_gt
+    if statuses:
+        params['statuses[]'] = list(statuses)
+    page = 0
+    while True:
+        params['page'] = page
+        response = clickup_session.get(tasks_url, params=params)
+        if response.status_code != 200:
+            logger.warning(f'Failed to fetch tasks. Status code: {response.status_code}')
+            response.raise_for_status()
+        tasks_data = response.json()
+        tasks = tasks_data.get('tasks', [])
+        for task in tasks:
+            yield task
+        # Clickup pages hold 100 tasks, a short page is the last one when the response has no last_page
+        last_page = tasks_data.get('last_page')
+        if last_page is None:
+            last_page = len(tasks) < 100
+        if last_page or not tasks:
+            return
+        page += 1
+
+def note_task_write(task_id, response):
+    """Records a write of the sync to a clickup task so the change it causes is not taken for a change made in clickup"""
+    try:
+        body = response.json()
+    except ValueError:
+        body = {}
+    if not isinstance(body, dict):
+        body = {}
+    record_task_write(task_id, max(int(body.get('date_updated') or body.get('date') or 0), int(time.time() * 1000)))
+
+def refresh_clickup_task_index(route, batch_size=100):
+    """Pulls the clickup tasks of a route changed since the last refresh into the local task index and returns their ids"""
+    clickup_list_id = route['clickup_list_id']
+    state_key = f'clickup_tasks:{clickup_list_id}'
+    last_updated = get_sync_state(state_key)
+    newest_update = last_updated
+    changed_task_ids = []
+    batch = []
+    for task in iter_clickup_tasks(route, date_updated_gt=last_updated, include_closed=True):
+        changed_task_ids.append(task['id'])
+        batch.append(task)
+        newest_update = max(newest_update or 0, int(task.get('date_updated') or 0))
+        if len(batch) >= batch_size:
+            save_clickup_tasks(clickup_list_id, batch)
+            batch = []
+    if batch:
+        save_clickup_tasks(clickup_list_id, batch)
+    if newest_update:
+        set_sync_state(state_key, newest_update)
+    return changed_task_ids
+
+def cached_metadata(key, loader, ttl=metadata_cache_ttl):
+    """Returns a metadata value from the local cache, loading and caching it when missing or older than ttl seconds"""
+    value = get_cached_metadata(key)
+    if value is None:
+        value = loader()
+        set_cached_metadata(key, value, ttl)
+    return value
+
+def get_list_statuses(route):
+    """Statuses of the Clickup list of a route, cached"""
+    return cached_metadata(f'list_statuses:{route["clickup_list_id"]}',
+                           lambda: fetch_clickup_list_details(route).get('statuses', []))
+
+def fetch_space_custom_fields(route):
+    """Fetches the custom field definitions of the Clickup space of a route"""
+    response = clickup_session.get(f"{clickup_api_url}/space/{route['clickup_space_id']}/field")
     if response.status_code == 200:
-        tasks_data = response.json()   #new line added 
-        return tasks_data['tasks'] if 'tasks' in tasks_data else []                                                                        #return response.json().get('tasks', [])
+        return response.json().get('fields', [])
     else:
-        print(f'Failed to fetch tasks. Status code: {response.status_code}')
+        logger.warning(f"Failed to fetch custom fields. Status code {response.status_code}. Response: {response.text}")
         response.raise_for_status()
 
-def get_valid_status():
+def get_request_type_field(route):
+    """The "Request Type" custom field definition of the space (cached) or None"""
+    fields = cached_metadata(f'space_fields:{route["clickup_space_id"]}', lambda: fetch_space_custom_fields(route))
+    for field in fields:
+        if field['name'] == "Request Type":  # Replace with the actual name of your custom field
+            return field
+    return None
+
+def get_request_type_custom_field_id(route):
+    """Request type custom field id: the one configured for the route, else the "Request Type" field of the space, else the built in id"""
+    if route['request_type_custom_field_id']:
+        return route['request_type_custom_field_id']
+    field = get_request_type_field(route)
+    return field['id'] if field else sync_request_type_custom_field_id
+
+def get_valid_status(route):
     """Retrieves the valid status for new tasks from the ClickUp list and returns string for new task"""
-    list_details = fetch_clickup_list_details()
-    statuses = list_details.get('statuses', [])
+    statuses = get_list_statuses(route)
     for status in statuses:
         if status.get('status', '').upper() == 'TO DO':
             return status['status']
@@ -136,11 +414,17 @@ def get_valid_status():
 #         print(f'Error fetching and processing statuses {e}')
 #         return None
                 
-def get_request_type_value(labels):
+def get_request_type_value(route, labels):
     """ Retrieves the request type value based on GitHub labels."""
     for label in labels:
         if label['name'].lower() in label_to_request_type_id:
             return label_to_request_type_id[label['name'].lower()]
+    # Labels named like one of the dropdown options of the request type field
+    field = get_request_type_field(route) or {}
+    options = {option['name'].lower(): option['id'] for option in field.get('type_config', {}).get('options', []) if option.get('name')}
+    for label in labels:
+        if label['name'].lower() in options:
+            return options[label['name'].lower()]
     return '7abfef5b-9190-4726-8ed5-d5e317eb9c93'  # Default to 'Task' if no match
 
 def get_priority_value(labels, request_type_value):
@@ -157,13 +441,41 @@ def get_priority_value(labels, request_type_value):
     else:
         return 2
 
-def task_exists(issue, clickup_tasks):
-    """Checks if a task exists in ClickUp based on the GitHub issue title."""
-    issue_title = issue['title'].strip().lower()  # Normalize the issue title
-    for task in clickup_tasks:
-        if 'name' in task and task['name'].strip().lower() == issue_title:  # Ensure name exists and compare
-            return True
-    return False
+def issue_content_hash(issue):
+    """Hash of the issue fields that are synced to clickup, used to skip issues that did not change since the last sync"""
+    fields = {
+        'title': issue['title'],
+        'body': issue.get('body') or '',
+        'state': issue['state'],
+        'labels': sorted(label['name'].lower() for label in issue['labels']),
+    }
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+def task_description(issue):
+    """Task description of a github issue: the body, the issue link and its images"""
+    body_content = issue.get("body", "No Description provided") or "No description provided"
+    description = body_content + f'\n\nOriginal GitHub Issue: {issue["html_url"]}'
+    for url in extract_image_urls(issue.get("body") or ''):
+        description += f'\n![Image]({url})'
+    return description
+
+def task_field_values(route, issue):
+    """Values of the clickup task fields mapped from a github issue, the task status is tracked separately"""
+    request_type_value = get_request_type_value(route, issue['labels'])
+    return {
+        'name': issue['title'],
+        'description': task_description(issue),
+        'priority': get_priority_value(issue['labels'], request_type_value),
+        'request_type': request_type_value,
+    }
+
+def task_field_hashes(fields):
+    """Hash of every task field value, stored with the mapping to find the fields that changed since the last sync"""
+    return {name: hashlib.sha256(json.dumps(value).encode('utf-8')).hexdigest()[:16] for name, value in fields.items()}
+
+def task_exists(route, issue):
+    """Checks if a task exists in ClickUp based on the GitHub issue title and returns it (task_id, status) or None."""
+    return find_clickup_task_by_name(route['clickup_list_id'], issue['title'])
 
 # def task_exists(issue, clickup_tasks):
 #     issue_title = issue['title'].strip().lower()
@@ -179,197 +491,720 @@ def task_exists(issue, clickup_tasks):
 #             return True
 #         return False
 
-def create_clickup_task(issue, valid_statuses, request_type_custom_field_id):
+def post_clickup_task(route, issue, valid_statuses, request_type_custom_field_id):
     """Creates a clickup task for the corresponding github issue and also fetches the request type , priority value and add the task title as the issue title
-    and add the description if provided and embed it with the issue link and set the request type and priority based on guthub labels"""
-    request_type_value = get_request_type_value(issue['labels'])
-    priority_value = get_priority_value(issue['labels'], request_type_value)
-    task_url = f'{clickup_api_url}/list/{clickup_list_id}/task'
-    body_content = issue.get("body", "No Description provided") or "No description provided"
-    description = body_content + f'\n\nOriginal GitHub Issue: {issue["html_url"]}'
-    issue_details = fetch_issue_details(issue["number"])
-    image_urls = extract_image_urls(issue_details["body"])
-    if image_urls:
-        description += f'\n![Image]({url})'
+    and add the description if provided and embed it with the issue link and set the request type and priority based on guthub labels.
+    Returns the created task and the image urls of the issue"""
+    fields = task_field_values(route, issue)
+    task_url = f'{clickup_api_url}/list/{route["clickup_list_id"]}/task'
+    image_urls = extract_image_urls(issue.get("body") or '')
     task_data = {
-        'name': issue['title'],
-        'description': description,                                          #issue.get('body', 'No description provided') + f'\n\nOriginal GitHub Issue: {issue["html_url"]}',
+        'name': fields['name'],
+        'description': fields['description'],                                #issue.get('body', 'No description provided') + f'\n\nOriginal GitHub Issue: {issue["html_url"]}',
         'status': valid_statuses,
-        'priority': priority_value,
+        'priority': fields['priority'],
         'assignees': [],
         'custom_fields': [
             {
                 'id': request_type_custom_field_id,
-                'value': request_type_value
+                'value': fields['request_type']
             }
         ]
     }
-    print(f"Request Data: {json.dumps(task_data, indent=4)}")
-    response = requests.post(task_url, headers=clickup_headers, json=task_data)
+    if debug_dumps:
+        logger.info(f"Request Data: {json.dumps(task_data, indent=4)}")
+    response = clickup_session.post(task_url, json=task_data)
     if response.status_code == 200:
-        task = response.json()   #task is not included here , this line was not included here 
-        clickup_task_url = task['url']
-        task_id = task['id'] 
-        task_name = task['name']
-        github_issue_url = issue["html_url"]
-        task_priority = task.get("priority", {}).get("id")
-        if task_priority in ["1", "2"]:
-            for url in image_urls:
-                upload_image_to_clickup_task(task_id, url)
-            send_slack_notification(issue['html_url'], task_name, clickup_task_url)   #these are not included, intended so that the notification is sent only for urgent/high priority ticket
-        return task
+        task = response.json()
+        save_clickup_tasks(route['clickup_list_id'], [task])
+        note_task_write(task['id'], response)
+        return task, image_urls
     else:
-        print(f'Failed to create task in clickup. Status code {response.status_code}')
-        print(f"Response: {response.text}")
+        logger.warning(f'Failed to create task in clickup. Status code {response.status_code}. Response: {response.text}')
+        if response.status_code == 400:
+            # Most likely a status or custom field that changed in clickup, reload them on the next attempt
+            invalidate_metadata()
         response.raise_for_status()
 
-response = requests.get(f"{clickup_api_url}/space/{clickup_space_id}/field", headers=clickup_headers)
-if response.status_code == 200:
-    custom_fields = response.json()
-    for field in custom_fields['fields']:
-        print(f"Field Name: {field['name']}, Field ID: {field['id']}")
-        if field['name'] == "Request Type":  # Replace with the actual name of your custom field
-            request_type_custom_field_id = field['id']
-else:
-    print(f"Failed to fetch custom fields. Status code {response.status_code}")
-    print(f"Response: {response.text}")
-
-
-#This is the working slack notification function
-def send_slack_notification(github_issue_url, task_name, clickup_task_url):
-    message = f"New ticket is created: {task_name} \n Ticket link: {clickup_task_url}\n Github issue link: {github_issue_url} "
-    payload = {
-        "text": message
-    }
-    headers = {
-        "Content-Type": "application/json"
-    }
-    response = requests.post(slack_webhook_url,json=payload, headers=headers)
+def fetch_clickup_task(task_id):
+    """Fetches a single clickup task"""
+    response = clickup_session.get(f'{clickup_api_url}/task/{task_id}')
     if response.status_code == 200:
-        print(f"Notification sent to slack successfully")
+        return response.json()
     else:
-        print(f"Failed to send notification to Slack. Status code {response.status_code}")
-        print(f"Response: {response.text}")
+        logger.warning(f'Failed to fetch task {task_id}. Status code {response.status_code}')
+        response.raise_for_status()
+
+def create_clickup_task(route, issue, valid_statuses, request_type_custom_field_id, notify=True):
+    """Creates a clickup task for the github issue with its image uploads and slack notification (urgent/high priority only), as durable jobs"""
+    task = run_job(f'create_task:{route["repo"]}#{issue["number"]}', 'create_task', {
+        'repo': route['repo'],
+        'issue': {key: issue.get(key) for key in JOB_ISSUE_FIELDS},
+        'status': valid_statuses,
+        'request_type_custom_field_id': request_type_custom_field_id,
+        'notify': notify,
+    })
+    run_follow_up_jobs(task['follow_up_jobs'])
+    return task
 
+def run_follow_up_jobs(job_keys):
+    """Runs the follow ups of a created task: the attachment uploads in parallel, then the rest in order"""
+    attachment_keys = [job_key for job_key in job_keys if job_key.startswith('attachment:')]
+    if attachment_keys:
+        with ThreadPoolExecutor(max_workers=attachment_concurrency) as executor:
+            for future in [executor.submit(run_job, job_key) for job_key in attachment_keys]:
+                future.result()
+    for job_key in job_keys:
+        if not job_key.startswith('attachment:'):
+            start_job(job_key)
 
 # Remove this function just for testing 
 def update_clickup_task(clickup_task_id, updates):
     url = f'{clickup_api_url}/task/{clickup_task_id}'
-    response = requests.put(url,headers=clickup_headers, json=updates)
+    response = clickup_session.put(url, json=updates)
+    if response.status_code == 200:
+        note_task_write(clickup_task_id, response)
+        logger.debug(f"Task {clickup_task_id} updated")
+    else:
+        logger.warning(f"Failed to update task {clickup_task_id}. Response: {response.text}")
+        response.raise_for_status()
+
+def set_clickup_custom_field(clickup_task_id, field_id, value):
+    """Sets one custom field of a task, custom fields can not be changed with the task PUT"""
+    url = f'{clickup_api_url}/task/{clickup_task_id}/field/{field_id}'
+    response = clickup_session.post(url, json={'value': value})
     if response.status_code == 200:
-        print(f"Task updated successfully")
+        note_task_write(clickup_task_id, response)
     else:
-        print(f"Failed to update task")
-        print(f"Response: {response.text}")
+        logger.warning(f"Failed to set custom field {field_id} of task {clickup_task_id}. Response: {response.text}")
+        response.raise_for_status()
 
-# Remove this function just for testing 
-def sync_github_issue_to_clickup_task(issue, clickup_tasks):
-    exists = False
-    for task in clickup_tasks:
-        if task['name'] == issue['title']:
-            exists = True
-            # Prepare for updates
-            updates = {}
-            if 'description' in issue and issue['body'] != task['description']:
-                updates['description'] = issue['body'] + f'\n\nOriginal GitHub Issue: {issue["html_url"]}'
-            if issue['state'] == 'closed' and task['status'] != 'complete':
-                updates['status'] = 'complete'
-            if updates:
-                update_clickup_task(task['id'], updates)
-            break
-    if not exists:
-        create_clickup_task(issue, 'TO DO', request_type_custom_field_id)
+# Issue fields kept in the payload of a create_task job
+JOB_ISSUE_FIELDS = ('number', 'node_id', 'title', 'body', 'html_url', 'labels', 'state', 'updated_at')
 
-# Remove this function just for testing 
-def handle_deleted_issues(github_issues, clickup_tasks):
-    github_titles = {issue["title"] for issue in github_issues}
-    for task in clickup_tasks:
-         if task['name'] not in github_titles:
-              update_clickup_task(task['id'], {'status': 'complete'})
+def job_route(payload):
+    """Route of a job, jobs queued before there were several routes belong to the first one"""
+    if 'repo' not in payload:
+        return sync_routes[0]
+    route = route_for_repo(payload['repo'])
+    if route is None:
+        raise KeyError(f"No route configured for {payload['repo']}")
+    return route
 
-# Remove this function just for testing 
-def fetch_github_comments(issue_number):
-    url = f"{github_api_url}/repos/{github_owner}/{github_repo}/issues/{issue_number}/comments"
-    response = requests.get(url, headers=github_headers)
-    if response.status_code == 200:
-        print(f"Comments fetched successfully")
-        return response.json()
+def handle_create_task_job(payload):
+    """Creates (or picks up) the task of a create_task job and queues its attachment uploads and slack notification"""
+    route = job_route(payload)
+    issue = payload['issue']
+    mapping = get_mapping(route['repo'], issue)
+    existing_task_id = mapping['task_id'] if mapping else (task_exists(route, issue) or {}).get('task_id')
+    if existing_task_id:
+        task = fetch_clickup_task(existing_task_id)
+        image_urls = extract_image_urls(issue.get('body') or '')
     else:
-        return []
-    
-# Remove this function just for testing 
+        task, image_urls = post_clickup_task(route, issue, payload['status'], payload['request_type_custom_field_id'])
+    save_mapping(route['repo'], issue, task['id'], issue_content_hash(issue),
+                 task_field_hashes(task_field_values(route, issue)), completed=issue['state'] == 'closed')
+    follow_up_jobs = []
+    task_priority = (task.get("priority") or {}).get("id")
+    if task_priority in ["1", "2"]:   # intended so that the images and notification are only for urgent/high priority tickets
+        for url in image_urls:
+            url_key = hashlib.sha256(url.encode('utf-8')).hexdigest()[:16]
+            follow_up_jobs.append((f'attachment:{task["id"]}:{url_key}', 'upload_attachment',
+                                   {'task_id': task['id'], 'image_url': url}))
+        if payload.get('notify', True):
+            follow_up_jobs.append((f'notify:{task["id"]}', 'notify', {
+                'github_issue_url': issue['html_url'], 'task_name': task['name'], 'clickup_task_url': task['url']
+            }))
+    result = {
+        'id': task['id'],
+        'name': task['name'],
+        'url': task['url'],
+        'follow_up_jobs': [job_key for job_key, _, _ in follow_up_jobs],
+    }
+    return result, follow_up_jobs
+
+JOB_HANDLERS = {
+    'create_task': handle_create_task_job,
+    'upload_attachment': lambda payload: (upload_image_to_clickup_task(payload['task_id'], payload['image_url']), ()),
+    'clickup_comment': lambda payload: (add_comment_to_clickup(payload['task_id'], payload['comment_text']), ()),
+    'github_comment': lambda payload: (add_comment_to_github(job_route(payload), payload['issue_number'], payload['comment_text']), ()),
+}
+
+# Owner of the job claims of this process
+JOB_OWNER = f'{socket.gethostname()}:{os.getpid()}'
+
+def run_job(job_key, kind=None, payload=None):
+    """Runs a durable job at most once to completion and returns its result, enqueuing it first when a kind is given.
+    A failure is recorded and re-raised, a job that failed job_max_attempts times raises without running"""
+    if kind is not None:
+        enqueue_job(job_key, kind, payload)
+    deadline = time.monotonic() + job_wait_seconds
+    while True:
+        job = claim_job(job_key, JOB_OWNER, job_claim_seconds)
+        if job is not None:
+            break
+        job = get_job(job_key)
+        if job is None:
+            raise KeyError(f'Unknown job {job_key}')
+        if job['status'] == 'done':
+            return job['result']
+        if job['status'] == 'failed':
+            raise RuntimeError(f"Job {job_key} failed after {job['attempts']} attempts: {job['last_error']}")
+        if time.monotonic() >= deadline:
+            raise RuntimeError(f"Job {job_key} is still running in {job['claimed_by']}")
+        time.sleep(0.5)
+    try:
+        with metrics.timer('job_duration_seconds', kind=job['kind']):
+            result, follow_up_jobs = JOB_HANDLERS[job['kind']](job['payload'])
+    except RequestsStopped:
+        # Not a failure of the job, the next run resumes it
+        release_job(job_key)
+        metrics.inc('jobs_total', kind=job['kind'], outcome='stopped')
+        raise
+    except Exception as e:
+        fail_job(job_key, e, job_max_attempts)
+        metrics.inc('jobs_total', kind=job['kind'], outcome='failed')
+        raise
+    complete_job(job_key, result, follow_up_jobs)
+    metrics.inc('jobs_total', kind=job['kind'], outcome='done')
+    return result
+
+def queue_notification_job(job_key):
+    """Hands a notify job to the background slack notifier, the job is completed once its digest is delivered"""
+    job = claim_job(job_key, JOB_OWNER, job_claim_seconds)
+    if job is None:
+        return   # already delivered or waiting in the notifier
+    payload = job['payload']
+    slack_notifier.notify(
+        payload['github_issue_url'], payload['task_name'], payload['clickup_task_url'],
+        on_delivered=lambda: complete_job(job_key),
+        on_failed=lambda error: fail_job(job_key, error, job_max_attempts)
+    )
+
+def start_job(job_key):
+    """Runs a queued job, notifications are queued for the slack notifier instead of being sent inline"""
+    if job_key.startswith('notify:'):
+        queue_notification_job(job_key)
+        return None
+    return run_job(job_key)
+
+def resume_pending_jobs():
+    """Runs the jobs an earlier run left pending or running with an expired claim, in the order they were queued"""
+    job_keys = pending_job_keys(job_claim_seconds)
+    if not job_keys:
+        return
+    logger.info(f"Resuming {len(job_keys)} pending job(s)")
+    # A task created right before a crash is found by its title instead of being created again
+    for route in sync_routes:
+        refresh_clickup_task_index(route)
+    for job_key in job_keys:
+        try:
+            result = start_job(job_key)
+            if isinstance(result, dict):
+                run_follow_up_jobs(result.get('follow_up_jobs', []))
+        except Exception as e:
+            logger.warning(f"Pending job {job_key} failed again: {e}")
+
+def sync_github_issue_to_clickup_task(route, issue, mapping):
+    """Writes the task fields whose hash changed since the last sync of the issue, returns True when the task was written to"""
+    content_hash = issue_content_hash(issue)
+    if content_hash == mapping['content_hash']:
+        if issue['updated_at'] != mapping['issue_updated_at']:
+            set_issue_updated_at(route['repo'], issue['number'], issue['updated_at'])
+        return False
+    fields = task_field_values(route, issue)
+    field_hashes = task_field_hashes(fields)
+    # Tasks mapped before the field hashes were stored get every field once
+    last_field_hashes = mapping['field_hashes'] or {}
+    changed = [name for name in fields if field_hashes[name] != last_field_hashes.get(name)]
+    updates = {name: fields[name] for name in changed if name != 'request_type'}
+    completed = issue['state'] == 'closed'
+    if completed != mapping['completed']:
+        updates['status'] = 'complete' if completed else get_valid_status(route)
+    if updates:
+        update_clickup_task(mapping['task_id'], updates)
+    if 'request_type' in changed:
+        set_clickup_custom_field(mapping['task_id'], get_request_type_custom_field_id(route), fields['request_type'])
+    save_mapping(route['repo'], issue, mapping['task_id'], content_hash, field_hashes, completed)
+    return bool(updates) or 'request_type' in changed
+
+def adopt_existing_task(route, issue, task):
+    """Maps a github issue to a clickup task found by title, completing it if the issue is closed"""
+    completed = issue['state'] == 'closed'
+    if completed and task['status'] != 'complete':
+        update_clickup_task(task['task_id'], {'status': 'complete'})
+    save_mapping(route['repo'], issue, task['task_id'], issue_content_hash(issue), completed=completed)
+
+def handle_deleted_issues(route, open_issue_numbers):
+    """Completes the mapped clickup tasks of a route whose issue is no longer open on github, once"""
+    for mapping in iter_mappings(route['repo'], completed=False):
+        if mapping['issue_number'] not in open_issue_numbers:
+            update_clickup_task(mapping['task_id'], {'status': 'complete'})
+            mark_completed(route['repo'], mapping['issue_number'])
+
+# Mirrored comments are tagged so they are never mirrored back: the ones posted to github carry a hidden html
+# comment, the ones posted to clickup start with a prefix
+GITHUB_MIRROR_MARKER = '<!-- mirrored from clickup -->'
+CLICKUP_MIRROR_PREFIX = '[GitHub] '
+
+def fetch_github_comments(route, issue_number, since=None):
+    """Fetches the comments of a github issue, all pages, only the ones created or edited at or after `since` (ISO 8601) when given"""
+    url = f"{github_issues_url(route)}/{issue_number}/comments"
+    params = {'per_page': 100}
+    if since:
+        params['since'] = since
+    comments = []
+    while url:
+        response = github_session.get(url, params=params)
+        if response.status_code != 200:
+            logger.warning(f"Failed to fetch github comments. Status code: {response.status_code}")
+            response.raise_for_status()
+        comments.extend(response.json())
+        url = response.links.get('next', {}).get('url')
+        params = None
+    return comments
+
 def add_comment_to_clickup(task_id, comment_text):
     url = f"{clickup_api_url}/task/{task_id}/comment"
     data = {
         'comment_text': comment_text
     }
-    response = requests.post(url, headers=clickup_headers, json=data)
+    response = clickup_session.post(url, json=data)
     if response.status_code == 200:
-        print(f"Comment added to clickup {response.text}")
+        note_task_write(task_id, response)
+        logger.debug(f"Comment added to clickup task {task_id}")
     else:
-        print(f"Failed to add comment to clickup")
+        logger.warning(f"Failed to add comment to clickup task {task_id}. Status code: {response.status_code}")
+        response.raise_for_status()
 
-# Remove this function just for testing  
-def add_comment_to_github(issue_number, comment_text):
-    url = f"{github_api_url}/repos/{github_owner}/{github_repo}/issues/{issue_number}/comments"
+def add_comment_to_github(route, issue_number, comment_text):
+    url = f"{github_issues_url(route)}/{issue_number}/comments"
     data = {
         'body': comment_text
     }
-    response = requests.post(url, headers=github_headers, json=data)
+    response = github_session.post(url, json=data)
     if response.status_code != 201:
-        print("Failed to add comment to GitHub issue:", response.text)
-
+        logger.warning(f"Failed to add comment to GitHub issue: {response.text}")
+        response.raise_for_status()
 
-# Remove this function just for testing     
-def fetch_clickup_comments(task_id):  
+def fetch_clickup_comments(task_id, after=0):
+    """Fetches the comments of a clickup task posted after `after` (unix time in ms), oldest first.
+    Clickup returns the 25 newest comments, older ones are paged with the start / start_id of the oldest comment received"""
     url = f"{clickup_api_url}/task/{task_id}/comment"
-    response = requests.get(url, headers=clickup_headers)
-    if response.status_code == 200:
-        print(f"Fetching comments from clickup")
-        return response.json()
+    params = {}
+    comments = []
+    while True:
+        response = clickup_session.get(url, params=params)
+        if response.status_code != 200:
+            logger.warning(f"Failed to fetch clickup comments. Status code: {response.status_code}")
+            response.raise_for_status()
+        page = response.json().get('comments', [])
+        for comment in page:
+            if int(comment['date']) <= after:
+                return comments[::-1]
+            comments.append(comment)
+        if len(page) < 25:
+            return comments[::-1]
+        params = {'start': page[-1]['date'], 'start_id': page[-1]['id']}
+
+def mirror_github_comment(task_id, comment):
+    """Posts a github comment to the clickup task, once, unless it was itself mirrored from clickup"""
+    if GITHUB_MIRROR_MARKER in (comment.get('body') or ''):
+        return
+    comment_text = f"{CLICKUP_MIRROR_PREFIX}{comment['user']['login']}: {comment['body']}"
+    run_job(f"comment:clickup:{comment['id']}", 'clickup_comment', {'task_id': task_id, 'comment_text': comment_text})
+
+def mirror_clickup_comment(route, issue_number, comment):
+    """Posts a clickup comment to the github issue, once, unless it was itself mirrored from github"""
+    if comment['comment_text'].startswith(CLICKUP_MIRROR_PREFIX):
+        return
+    comment_text = f"{comment['user']['username']}: {comment['comment_text']}\n\n{GITHUB_MIRROR_MARKER}"
+    run_job(f"comment:github:{comment['id']}", 'github_comment',
+            {'repo': route['repo'], 'issue_number': issue_number, 'comment_text': comment_text})
+
+def sync_github_comments_to_clickup(route, issue, task_id):
+    """Mirrors the github comments added since the thread cursor (or the issue's 'comment_list') to the clickup task.
+    Returns the number of new comments written on github"""
+    cursor_key = f'comment_cursor:github:{route["repo"]}#{issue["number"]}'
+    cursor = get_sync_state(cursor_key)
+    if not issue.get('comments') or (cursor and issue['updated_at'] <= cursor):
+        return 0
+    if 'comment_list' in issue:
+        comments = issue['comment_list']
     else:
-        return []
-    
-# Remove this function just for testing  
-def sync_comments_between_github_clickup(issue, task_id):
-    github_comments = fetch_github_comments(issue['number'])
-    clickup_comments = fetch_clickup_comments(task_id)
-    for comment in github_comments:
-        comment_text = f"{comment['user']['login']}: {comment['body']}"
-        add_comment_to_clickup(task_id, comment_text)
-    for comment in clickup_comments["comments"]:
-        comment_text = f"{comment['user']['username']}: {comment['comment_text']}"
-        add_comment_to_github(issue['number'], comment_text)
-    
+        comments = fetch_github_comments(route, issue['number'], since=cursor)
+    for comment in comments:
+        mirror_github_comment(task_id, comment)
+    # Any new comment bumps the issue updated_at, so nothing older than it is left to fetch
+    set_sync_state(cursor_key, max([comment['updated_at'] for comment in comments] + [issue['updated_at']]))
+    # `since` is inclusive, the comments at the cursor were already counted by the cycle that saw them
+    return sum(1 for comment in comments
+               if (not cursor or comment['updated_at'] > cursor) and GITHUB_MIRROR_MARKER not in (comment.get('body') or ''))
+
+def sync_clickup_comments_to_github(route, issue_number, task_id):
+    """Mirrors the clickup comments added since the task thread cursor to the github issue and moves the cursor"""
+    cursor_key = f'comment_cursor:clickup:{task_id}'
+    cursor = get_sync_state(cursor_key, 0)
+    comments = fetch_clickup_comments(task_id, after=cursor)
+    for comment in comments:
+        mirror_clickup_comment(route, issue_number, comment)
+    if comments:
+        set_sync_state(cursor_key, int(comments[-1]['date']))
 
 # Uncomment this function as this was the main function which is working 
 
-def sync_github_to_clickup():
-    """Sync with github make sure that the issues"""
+def run_bounded(worker, items, concurrency):
+    """Runs worker(item) for every item on `concurrency` threads, returns the list of (item, exception) failures"""
+    failures = []
+    pending = {}
+    def collect(done):
+        for future in done:
+            item = pending.pop(future)
+            if future.exception() is not None:
+                failures.append((item, future.exception()))
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for item in items:
+            if len(pending) >= concurrency * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending[executor.submit(worker, item)] = item
+        done, _ = wait(pending)
+        collect(done)
+    return failures
+
+def sync_issue(route, issue, valid_statuses, request_type_custom_field_id, ensure_task_index, backfill=False):
+    """Syncs one github issue: updates its mapped task, adopts an existing task with the same title or creates a new one.
+    Returns True when the issue had changes for clickup"""
+    mapping = get_mapping(route['repo'], issue)
+    if mapping and mapping['issue_updated_at'] and issue['updated_at'] < mapping['issue_updated_at']:
+        # A webhook delivered out of order or a listing older than a delivery, the task has a newer state already
+        logger.debug(f"Skipping issue #{issue['number']}, a newer version of it was synced already.")
+        metrics.inc('issues_synced_total', action='stale')
+        return False
+    if mapping:
+        # If the task exists, sync it with the current state of the GitHub issue
+        updated = sync_github_issue_to_clickup_task(route, issue, mapping)
+        if updated:
+            logger.debug(f"Task for issue #{issue['number']} updated.")
+            metrics.inc('issues_synced_total', action='updated')
+        else:
+            metrics.inc('issues_synced_total', action='unchanged')
+        return sync_github_comments_to_clickup(route, issue, mapping['task_id']) > 0 or updated
+    ensure_task_index()
+    existing_task = task_exists(route, issue)
+    if existing_task:
+        adopt_existing_task(route, issue, existing_task)
+        metrics.inc('issues_synced_total', action='adopted')
+        logger.debug(f"Task for issue #{issue['number']} already exists. Skipping creation.")
+        sync_github_comments_to_clickup(route, issue, existing_task['task_id'])
+        return True
+    if issue['state'] == 'closed' and not backfill:
+        # Incremental runs also see closed issues, only existing tasks need to be completed
+        metrics.inc('issues_synced_total', action='skipped')
+        return False
+    if issue['state'] == 'closed':
+        valid_statuses = 'complete'
+    logger.debug(f"Creating ClickUp task for issue #{issue['number']}: {issue['title']}")
+    clickup_task = create_clickup_task(route, issue, valid_statuses,request_type_custom_field_id, notify=not backfill)
+    logger.debug(f"Created ClickUp task: {clickup_task['id']}")
+    metrics.inc('issues_synced_total', action='created')
+    # Sync comments for the newly created task
+    sync_github_comments_to_clickup(route, issue, clickup_task['id'])
+    return True
+
+def sync_single_issue(route, issue):
+    """Syncs just one github issue, used for webhook events"""
+    sync_issue(route, issue, get_valid_status(route), get_request_type_custom_field_id(route),
+               lambda: refresh_clickup_task_index(route))
+
+def complete_deleted_issue(route, issue):
+    """Completes the clickup task of a github issue that was deleted"""
+    mapping = get_mapping(route['repo'], issue)
+    if mapping and not mapping['completed']:
+        update_clickup_task(mapping['task_id'], {'status': 'complete'})
+        mark_completed(route['repo'], issue['number'])
+
+def interleave(iterables):
+    """Round robin over several iterables, one item of each in turn until all of them are exhausted"""
+    iterators = [iter(iterable) for iterable in iterables]
+    while iterators:
+        for iterator in list(iterators):
+            try:
+                yield next(iterator)
+            except StopIteration:
+                iterators.remove(iterator)
+
+def start_route_cycle(route, check_open_issues=False):
+    """Reads the sync state of a route and loads what its cycle needs"""
+    state_key = f'github_issues:{route["repo"]}'
+    issues_state = get_sync_state(state_key, {})
+    issues_state.pop('etag', None)   # single ETag of older stores, not keyed by query
+    since = issues_state.get('since')
+    refresh_clickup_task_index(route)
+    return {
+        'route': route,
+        'state_key': state_key,
+        'issues_state': issues_state,
+        'since': since,
+        'high_water_mark': since,
+        'valid_statuses': get_valid_status(route),
+        'request_type_custom_field_id': get_request_type_custom_field_id(route),
+        'changed_tasks': tasks_changed_in_clickup(route['clickup_list_id']),
+        'check_open_issues': check_open_issues or not since or time.time() - issues_state.get('open_checked_at', 0) >= open_issues_check_hours * 3600,
+        'open_issue_numbers': None,
+        'etag_caches': [],
+        'issues': 0,
+        'changed_issues': [],
+        # Issues and tasks that failed in earlier cycles, by number / task id with the number of cycles they failed
+        'retry_issues': issues_state.get('failed_issues', {}),
+        'retry_tasks': issues_state.get('failed_tasks', {}),
+        'failed_issues': [],
+        'failed_tasks': [],
+        'failures': [],
+        'completed': False,
+    }
+
+def iter_route_work(cycle):
+    """Yields the (cycle, kind, item) work of a route cycle: its github issues, failed issues to retry and changed tasks"""
+    route = cycle['route']
+    since = cycle['since']
+    if since:
+        logger.debug(f'Fetching github issues of {route["repo"]} updated since {since}....')
+        params = {'state': 'all', 'since': since, 'sort': 'updated', 'direction': 'asc'}
+        etag_cache = issues_etag_cache(cycle['issues_state'], 'updates', params)
+    else:
+        logger.debug(f'Fetching github issues of {route["repo"]}....')
+        params = {'state': 'open'}
+        etag_cache = issues_etag_cache(cycle['issues_state'], 'open', params)
+    cycle['etag_caches'].append(etag_cache)
+    open_issue_numbers = set()
+    retry_issue_numbers = {int(number) for number in cycle['retry_issues']}
+    try:
+        for issue in iter_github_issues(route, params, etag_cache):
+            if not cycle['high_water_mark'] or issue['updated_at'] > cycle['high_water_mark']:
+                cycle['high_water_mark'] = issue['updated_at']
+            if 'pull_request' in issue:
+                # The issues endpoint lists the pull requests too, they are not synced (like in the webhook and backfill)
+                continue
+            if not since:
+                open_issue_numbers.add(issue['number'])
+            retry_issue_numbers.discard(issue['number'])
+            cycle['issues'] += 1
+            yield cycle, 'issue', issue
+        if since and cycle['check_open_issues']:
+            logger.debug(f'Listing the open github issues of {route["repo"]}....')
+            params = {'state': 'open'}
+            etag_cache = issues_etag_cache(cycle['issues_state'], 'open', params)
+            cycle['etag_caches'].append(etag_cache)
+            open_issue_numbers = {issue['number'] for issue in iter_github_issues(route, params, etag_cache)
+                                  if 'pull_request' not in issue}
+        # Not modified: no issue was deleted or transferred since the last listing completed the missing ones
+        if cycle['check_open_issues'] and not etag_cache.get('not_modified'):
+            cycle['open_issue_numbers'] = open_issue_numbers
+    except requests.exceptions.RequestException as e:
+        cycle['failures'].append(('github issues', e))
+        return
+    # Issues that failed before and did not change since, fetched one by one
+    for number in sorted(retry_issue_numbers):
+        yield cycle, 'retry_issue', {'number': number}
+    # Comments added on the clickup side, only for the mapped tasks changed in clickup since they were last checked
+    for task_id, date_updated in cycle['changed_tasks']:
+        mapping = get_mapping_by_task_id(route['repo'], task_id)
+        if mapping:
+            yield cycle, 'clickup_comments', dict(mapping, date_updated=date_updated)
+
+def run_route_work(work):
+    cycle, kind, item = work
+    route = cycle['route']
+    with metrics.timer('work_duration_seconds', kind=kind):
+        if kind == 'retry_issue':
+            item = fetch_issue_details(route, item['number'])
+            if item is None:
+                return
+        if kind in ('issue', 'retry_issue'):
+            if sync_issue(route, item, cycle['valid_statuses'], cycle['request_type_custom_field_id'], lambda: None):
+                cycle['changed_issues'].append(item['number'])
+        else:
+            sync_clickup_comments_to_github(route, item['issue_number'], item['task_id'])
+            mark_task_checked(item['task_id'], item['date_updated'])
+
+def finish_route_cycle(cycle):
+    """Completes the tasks of deleted issues, records the failed issues and tasks and advances the high-water mark of a route"""
+    route = cycle['route']
+    for label, error in cycle['failures']:
+        logger.warning(f"Failed to sync {label} of {route['repo']}: {error}")
+    if cycle['failures']:
+        logger.warning(f"The sync of {route['repo']} did not finish, everything updated since the last one is retried on the next run.")
+        return
+    failed_issues = {}
+    for number, error in cycle['failed_issues']:
+        attempts = cycle['retry_issues'].get(str(number), 0) + 1
+        if attempts < job_max_attempts:
+            logger.warning(f"Failed to sync issue #{number} of {route['repo']}, retrying on the next run: {error}")
+            failed_issues[str(number)] = attempts
+        else:
+            logger.error(f"Giving up on issue #{number} of {route['repo']} until it changes again: {error}")
+    failed_tasks = {}
+    for task_id, date_updated, error in cycle['failed_tasks']:
+        attempts = cycle['retry_tasks'].get(task_id, 0) + 1
+        if attempts < job_max_attempts:
+            logger.warning(f"Failed to sync the comments of task {task_id}, retrying on the next run: {error}")
+            failed_tasks[task_id] = attempts
+        else:
+            logger.error(f"Giving up on the comments of task {task_id} until it changes again: {error}")
+            mark_task_checked(task_id, date_updated)
+    cycle['issues_state']['failed_issues'] = failed_issues
+    cycle['issues_state']['failed_tasks'] = failed_tasks
+    if cycle['open_issue_numbers'] is not None:
+        # Only a listing of every open issue tells the deleted ones, an incremental fetch would complete unrelated tasks
+        handle_deleted_issues(route, cycle['open_issue_numbers'])
+    if cycle['check_open_issues']:
+        cycle['issues_state']['open_checked_at'] = time.time()
+    for etag_cache in cycle['etag_caches']:
+        store_issues_etag(cycle['issues_state'], etag_cache)
+    cycle['issues_state']['since'] = cycle['high_water_mark']
+    set_sync_state(cycle['state_key'], cycle['issues_state'])
+    cycle['completed'] = not failed_issues and not failed_tasks
+    if cycle['completed']:
+        logger.info(f"All issues of {route['repo']} have been successfully added to ClickUp.")
+
+def sync_github_to_clickup(routes=None, concurrency=None, stop_event=None, check_open_issues=False):
+    """Sync with github make sure that the issues.
+    Syncs every route (sync_routes by default) in one cycle, returns its summary or None when another cycle is running"""
+    with sync_lease() as acquired:
+        if not acquired:
+            logger.info("Another sync cycle is running, skipping this one.")
+            metrics.inc('sync_cycles_total', outcome='skipped')
+            return None
+        return run_sync_cycle(routes or sync_routes, concurrency or sync_concurrency, stop_event, check_open_issues)
+
+def run_sync_cycle(routes, concurrency, stop_event, check_open_issues=False):
+    cycle_started = time.monotonic()
+    phases = {}
+    phase_started = cycle_started
+    def end_phase(name):
+        nonlocal phase_started
+        now = time.monotonic()
+        phases[name] = round(now - phase_started, 3)
+        metrics.set('sync_cycle_phase_seconds', phases[name], phase=name)
+        phase_started = now
     try:
-        print(f'Fetching github issues....')
-        issues = fetch_github_issues()
-        clickup_tasks = fetch_clickup_tasks()
-        print(f"Existing ClickUp tasks: {[task['name'] for task in clickup_tasks]}")  # Debugging line
-        list_details = fetch_clickup_list_details()
-        valid_statuses = get_valid_status()
-        initial_status = valid_statuses[0] if valid_statuses else 'TO DO' 
-        request_type_custom_field_id = "0f3ee9db-dd7d-4893-80ae-3f2f816043d4"                                         #'c7bcbc1f-d7ee-4355-98d5-8706cf0f9bcc'  # Request type id
-        # Update existing tasks or create new tasks for each GitHub issue
-        for issue in issues:
-            if task_exists(issue, clickup_tasks):
-                # If the task exists, sync it with the current state of the GitHub issue
-                sync_github_issue_to_clickup_task(issue, clickup_tasks) # remove this 
-                print(f"Task for issue #{issue['number']} updated or verified as existing.") # remove this 
-                print(f"Task for issue #{issue['number']} already exists. Skipping creation.") 
-                continue                                                                        
-            print(f"Creating ClickUp task for issue #{issue['number']}: {issue['title']}")
-            clickup_task = create_clickup_task(issue, valid_statuses,request_type_custom_field_id)
-            print(f"Created ClickUp task: {clickup_task['id']}")
-        handle_deleted_issues(issues, clickup_tasks)  # remove this 
-        print("All issues have been successfully added to ClickUp.")
+        resume_pending_jobs()
     except requests.exceptions.RequestException as e:
-        print(f"An error occurred: {e}")
+        logger.error(f"An error occurred: {e}")
+    end_phase('resume_jobs')
+    cycles = []
+    for route in routes:
+        try:
+            cycles.append(start_route_cycle(route, check_open_issues))
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Skipping {route['repo']} this cycle, an error occurred: {e}")
+    end_phase('prepare')
+    # Update existing tasks or create new tasks for each GitHub issue
+    work = interleave(iter_route_work(cycle) for cycle in cycles)
+    if stop_event is not None:
+        work = until_stopped(work, stop_event)
+    failures = run_bounded(run_route_work, work, concurrency)
+    for (cycle, kind, item), error in failures:
+        if kind == 'clickup_comments':
+            cycle['failed_tasks'].append((item['task_id'], item['date_updated'], error))
+        else:
+            cycle['failed_issues'].append((item['number'], error))
+    if stop_event is not None and stop_event.is_set():
+        for cycle in cycles:
+            cycle['failures'].append(('remaining issues', 'stopped before the end of the cycle'))
+    end_phase('sync')
+    for cycle in cycles:
+        try:
+            finish_route_cycle(cycle)
+        except requests.exceptions.RequestException as e:
+            logger.error(f"An error occurred: {e}")
+    end_phase('finish')
+    duration = time.monotonic() - cycle_started
+    completed = len(cycles) == len(routes) and all(cycle['completed'] for cycle in cycles)
+    metrics.observe('sync_cycle_duration_seconds', duration)
+    metrics.set('sync_cycle_last_duration_seconds', round(duration, 3))
+    metrics.inc('sync_cycles_total', outcome='completed' if completed else 'failed')
+    for cycle in cycles:
+        metrics.set('route_issues_last_cycle', cycle['issues'], repo=cycle['route']['repo'])
+        metrics.set('route_failures_last_cycle', len(cycle['failures']) + len(cycle['failed_issues']) + len(cycle['failed_tasks']),
+                    repo=cycle['route']['repo'])
+    log_event('sync_cycle', duration=round(duration, 3), completed=completed, phases=phases, routes=[{
+        'repo': cycle['route']['repo'], 'issues': cycle['issues'], 'changed_issues': len(cycle['changed_issues']),
+        'changed_tasks': len(cycle['changed_tasks']), 'failures': len(cycle['failures']),
+        'failed_issues': len(cycle['failed_issues']), 'failed_tasks': len(cycle['failed_tasks']), 'completed': cycle['completed'],
+    } for cycle in cycles], metrics=metrics.snapshot())
+    changed_issues = sum(len(cycle['changed_issues']) for cycle in cycles)
+    changed_tasks = sum(len(cycle['changed_tasks']) for cycle in cycles)
+    return {
+        'duration': duration,
+        'completed': completed,
+        'issues': sum(cycle['issues'] for cycle in cycles),
+        'changed_issues': changed_issues,
+        'changed_tasks': changed_tasks,
+        'changes': changed_issues + changed_tasks,
+    }
+
+def until_stopped(items, stop_event):
+    """Yields the items until stop_event is set"""
+    for item in items:
+        if stop_event.is_set():
+            return
+        yield item
+
+@contextmanager
+def sync_lease(name='sync_cycle'):
+    """Holds the store lease of the sync cycle while the block runs, yields False when another process or thread holds it"""
+    owner = f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+    if not acquire_lease(name, owner, sync_lease_seconds):
+        yield False
+        return
+    stop_renewing = threading.Event()
+    def renew():
+        while not stop_renewing.wait(sync_lease_seconds / 3):
+            acquire_lease(name, owner, sync_lease_seconds)
+    renewer = threading.Thread(target=renew, name='sync-lease', daemon=True)
+    renewer.start()
+    try:
+        yield True
+    finally:
+        stop_renewing.set()
+        renewer.join()
+        release_lease(name, owner)
+
+def next_poll_interval(interval, summary):
+    """Poll interval after a cycle: halved after changes, doubled otherwise, stretched until poll_min_budget of the rate budgets is back"""
+    if summary is not None and summary['changes']:
+        interval = max(poll_interval_min, interval / 2)
+    else:
+        interval = min(poll_interval_max, interval * 2)
+    for limiter in (github_rate_limiter, clickup_rate_limiter):
+        interval = max(interval, min(limiter.seconds_until_available(poll_min_budget), poll_interval_max))
+    return interval
+
+def run_daemon(stop_event=None):
+    """Keeps syncing in one long running process until SIGTERM / SIGINT, with an adaptive poll interval"""
+    stop_event = stop_event or threading.Event()
+    def stop(signum, frame):
+        logger.info(f"Received signal {signum}, stopping after the work in flight.")
+        stop_event.set()
+        shutdown_event.set()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    interval = poll_interval_min
+    while not stop_event.is_set():
+        try:
+            summary = sync_github_to_clickup(stop_event=stop_event)
+        except Exception:
+            logger.exception("Sync cycle failed")
+            metrics.inc('sync_cycles_total', outcome='error')
+            summary = None
+        interval = next_poll_interval(interval, summary)
+        metrics.set('poll_interval_seconds', round(interval, 1))
+        if not stop_event.is_set():
+            logger.info(f"Next sync in {interval:.0f}s")
+            stop_event.wait(interval)
+    slack_notifier.flush()
 
 # def sync_github_to_clickup():
 #     """Sync with github make sure that the issues."""
@@ -403,13 +1238,24 @@ def sync_github_to_clickup():
 #     except requests.exceptions.RequestException as e:
 #         print(f"An error occurred: {e}")
 
-# def schedule_script():
-#     """script will run every 4 hour and check for new issue in github and creates task"""
-#     schedule.every(4).hours.do(sync_github_to_clickup)
-#     while True:
-#         schedule.run_pending()
-#         time.sleep(1)    
-
 if __name__ == '__main__':
-    sync_github_to_clickup()
-    #schedule_script()
+    parser = argparse.ArgumentParser(description='Sync github issues to clickup tasks')
+    parser.add_argument('--invalidate-cache', action='store_true',
+                        help='drop the cached clickup statuses and custom fields before syncing')
+    parser.add_argument('--daemon', action='store_true',
+                        help='keep syncing with an adaptive poll interval until SIGTERM instead of running one cycle')
+    parser.add_argument('--retry-failed', action='store_true',
+                        help=f'run the jobs that failed {job_max_attempts} times again')
+    args = parser.parse_args()
+    configure_logging()
+    if args.invalidate_cache:
+        invalidate_metadata()
+    if args.retry_failed:
+        logger.info(f"Retrying {retry_failed_jobs()} failed job(s)")
+    if metrics_port:
+        serve_metrics(metrics_port)
+    if args.daemon:
+        run_daemon()
+    else:
+        sync_github_to_clickup()
+        slack_notifier.flush()
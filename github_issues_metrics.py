@@ -0,0 +1,178 @@
+import re
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from github_issues_config import metrics_file, log_level
+
+# In process metrics of the sync: counters, gauges and latency histograms with labels, served in the prometheus
+# text format (and as json) by serve_metrics, plus structured events written as JSON lines to metrics_file.
+# Recording is a dict update under a lock so it stays on in production
+
+METRIC_PREFIX = 'github_issues_'
+
+logger = logging.getLogger(__name__)
+
+# Seconds, from a cached local call to a slow upload
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# Path segments with a digit are ids (issue numbers, task and list ids), they are collapsed to keep the number of
+# series small. Api versions (/api/v2) are kept
+ID_SEGMENT = re.compile(r'/(?!v\d+(?:/|$))[^/]*\d[^/]*')
+GITHUB_REPO_PATH = re.compile(r'/repos/[^/]+/[^/]+')
+
+
+def endpoint_template(path):
+    """Endpoint label of an API path: /repos/o/r/issues/12/comments -> /repos/{repo}/issues/{id}/comments"""
+    path = GITHUB_REPO_PATH.sub('/repos/{repo}', path)
+    return ID_SEGMENT.sub('/{id}', path)
+
+
+def _labels_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Metrics:
+    """Thread safe registry of labelled counters, gauges and histograms"""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, _labels_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observes the duration of the block in seconds, also when it raises"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - started, **labels)
+
+    def snapshot(self):
+        """Every series as plain json data, histograms with their count and sum only"""
+        with self.lock:
+            return {
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in sorted(self.counters.items())],
+                'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                           for (name, labels), value in sorted(self.gauges.items())],
+                'histograms': [{'name': name, 'labels': dict(labels), 'count': histogram['count'],
+                                'sum': round(histogram['sum'], 6)}
+                               for (name, labels), histogram in sorted(self.histograms.items())],
+            }
+
+    def render_prometheus(self):
+        """Every series in the prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for kind, series in (('counter', self.counters), ('gauge', self.gauges)):
+                last_name = None
+                for (name, labels), value in sorted(series.items()):
+                    if name != last_name:
+                        lines.append(f'# TYPE {METRIC_PREFIX}{name} {kind}')
+                        last_name = name
+                    lines.append(f'{METRIC_PREFIX}{name}{_format_labels(labels)} {value}')
+            last_name = None
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                if name != last_name:
+                    lines.append(f'# TYPE {METRIC_PREFIX}{name} histogram')
+                    last_name = name
+                cumulative = 0
+                for bound, count in zip(self.buckets, histogram['buckets']):
+                    cumulative += count
+                    lines.append(f'{METRIC_PREFIX}{name}_bucket{_format_labels(labels, [("le", str(bound))])} {cumulative}')
+                lines.append(f'{METRIC_PREFIX}{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {histogram["count"]}')
+                lines.append(f'{METRIC_PREFIX}{name}_sum{_format_labels(labels)} {histogram["sum"]}')
+                lines.append(f'{METRIC_PREFIX}{name}_count{_format_labels(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
+
+_events_lock = threading.Lock()
+_events_file = None
+
+
+def configure_logging(level=log_level):
+    """Sets up the python logging output of the entry points"""
+    logging.basicConfig(level=level, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def log_event(event, **fields):
+    """Appends one structured event as a JSON line to metrics_file, nothing happens when it is not configured"""
+    global _events_file
+    if not metrics_file:
+        return
+    line = json.dumps(dict({'ts': round(time.time(), 3), 'event': event}, **fields), default=str)
+    with _events_lock:
+        if _events_file is None:
+            _events_file = open(metrics_file, 'a', buffering=1)
+        _events_file.write(line + '\n')
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """GET /metrics in the prometheus text format, GET /metrics.json as json"""
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            body = metrics.render_prometheus().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path == '/metrics.json':
+            body = json.dumps(metrics.snapshot()).encode('utf-8')
+            content_type = 'application/json'
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port):
+    """Serves the metrics on a background thread and returns the server"""
+    server = ThreadingHTTPServer(('', port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    logger.info(f"Serving metrics on http://localhost:{server.server_address[1]}/metrics")
+    return server
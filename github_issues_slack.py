@@ -0,0 +1,173 @@
+import sys
+import json
+import time
+import queue
+import random
+import atexit
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from github_issues_config import slack_webhook_url, slack_digest_window, slack_delivery_retries
+from github_issues_client import slack_session
+
+logger = logging.getLogger(__name__)
+
+# Slack notifications are queued and sent by a background thread, the notifications that arrive within
+# slack_digest_window seconds are merged into a single Block Kit digest so the sync never waits on slack
+
+# Slack accepts at most 50 blocks per message, one header plus one section per ticket
+MAX_TICKETS_PER_MESSAGE = 45
+
+
+def escape_mrkdwn(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def build_digest(events):
+    """Block Kit message for a list of new ticket events, with a plain text fallback"""
+    if len(events) == 1:
+        title = f"New ticket is created: {events[0]['task_name']}"
+    else:
+        title = f"{len(events)} new tickets are created"
+    blocks = [{'type': 'header', 'text': {'type': 'plain_text', 'text': title[:150]}}]
+    for event in events:
+        blocks.append({
+            'type': 'section',
+            'text': {
+                'type': 'mrkdwn',
+                'text': f"*<{event['clickup_task_url']}|{escape_mrkdwn(event['task_name'])}>*\n"
+                        f"<{event['github_issue_url']}|Github issue>"
+            }
+        })
+    return {'text': title, 'blocks': blocks}
+
+
+class SlackNotifier:
+    """Background delivery queue for slack notifications.
+    notify() only queues the event, on_delivered / on_failed are called from the delivery thread once the digest
+    holding the event was sent or gave up after slack_delivery_retries attempts"""
+
+    def __init__(self, webhook_url=slack_webhook_url, window=slack_digest_window, retries=slack_delivery_retries):
+        self.webhook_url = webhook_url
+        self.window = window
+        self.retries = retries
+        self.queue = queue.Queue()
+        self.flush_now = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def notify(self, github_issue_url, task_name, clickup_task_url, on_delivered=None, on_failed=None):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='slack-notifier', daemon=True)
+                self.thread.start()
+        self.queue.put({
+            'github_issue_url': github_issue_url,
+            'task_name': task_name,
+            'clickup_task_url': clickup_task_url,
+            'on_delivered': on_delivered,
+            'on_failed': on_failed,
+        })
+
+    def flush(self):
+        """Sends everything queued right away and waits until it is delivered"""
+        if self.thread is None:
+            return
+        self.flush_now.set()
+        self.queue.join()
+        self.flush_now.clear()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < MAX_TICKETS_PER_MESSAGE:
+                if self.flush_now.is_set():
+                    # Flushing: take what is already queued and send it without waiting for the window
+                    try:
+                        batch.append(self.queue.get_nowait())
+                        continue
+                    except queue.Empty:
+                        break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=min(remaining, 0.1)))
+                except queue.Empty:
+                    continue
+            try:
+                self.deliver(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def deliver(self, batch):
+        if not self.webhook_url:
+            logger.warning(f"Slack webhook url is not configured, dropping {len(batch)} notification(s)")
+            error = None
+        else:
+            error = self.post(build_digest(batch))
+        for event in batch:
+            callback = event['on_failed'] if error else event['on_delivered']
+            if callback is None:
+                continue
+            try:
+                if error:
+                    callback(error)
+                else:
+                    callback()
+            except Exception as e:
+                logger.warning(f"Slack notification callback failed: {e}")
+
+    def post(self, payload):
+        """Posts one message, retrying with jittered backoff, returns None on success or the last error"""
+        error = None
+        for attempt in range(self.retries):
+            try:
+                response = slack_session.post(self.webhook_url, json=payload)
+                if response.status_code == 200:
+                    logger.debug(f"Notification sent to slack successfully ({len(payload['blocks']) - 1} ticket(s))")
+                    return None
+                error = f"Status code {response.status_code}: {response.text}"
+            except Exception as e:
+                error = str(e)
+            logger.warning(f"Failed to send notification to Slack. {error}")
+            if attempt + 1 < self.retries:
+                time.sleep(random.uniform(0, 2 ** attempt))
+        return error
+
+
+slack_notifier = SlackNotifier()
+atexit.register(slack_notifier.flush)
+
+
+class StubWebhookHandler(BaseHTTPRequestHandler):
+    """Local stand in for a slack incoming webhook, prints every message it receives"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        print(json.dumps(json.loads(body or b'{}'), indent=2))
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_stub(port=8099):
+    """Runs the stub webhook, point slack_webhook_url to http://localhost:<port>/ to test notifications"""
+    server = HTTPServer(('', port), StubWebhookHandler)
+    print(f"Stub slack webhook listening on http://localhost:{port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    serve_stub(int(sys.argv[1]) if len(sys.argv) > 1 else 8099)
@@ -0,0 +1,437 @@
+import json
+import time
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from github_issues_config import sync_db_path
+
+# Local SQLite store that maps github issues to clickup tasks and keeps the sync state between runs
+
+# One connection per thread, sqlite connections can not be shared between the sync workers
+_local = threading.local()
+_process_lock = threading.Lock()
+_store_prepared = False
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS issue_task_map (
+    repo TEXT NOT NULL,
+    issue_number INTEGER NOT NULL,
+    node_id TEXT,
+    task_id TEXT NOT NULL,
+    content_hash TEXT,
+    field_hashes TEXT,
+    completed INTEGER NOT NULL DEFAULT 0,
+    synced_at TEXT,
+    issue_updated_at TEXT,
+    PRIMARY KEY (repo, issue_number)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS issue_task_map_node_id ON issue_task_map (node_id);
+CREATE INDEX IF NOT EXISTS issue_task_map_task_id ON issue_task_map (task_id);
+CREATE TABLE IF NOT EXISTS clickup_tasks (
+    list_id TEXT NOT NULL,
+    task_id TEXT PRIMARY KEY,
+    name_key TEXT NOT NULL,
+    status TEXT,
+    date_updated INTEGER,
+    written_at INTEGER,
+    checked_at INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS clickup_tasks_name ON clickup_tasks (list_id, name_key);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attachments (
+    url TEXT PRIMARY KEY,
+    sha256 TEXT,
+    content_type TEXT,
+    size INTEGER,
+    filename TEXT
+);
+CREATE TABLE IF NOT EXISTS task_attachments (
+    task_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    PRIMARY KEY (task_id, sha256)
+);
+CREATE TABLE IF NOT EXISTS metadata_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job_key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    result TEXT,
+    updated_at TEXT,
+    claimed_by TEXT,
+    claimed_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Columns added to existing stores, (table, column, definition, expression the existing rows are filled with or None)
+MIGRATIONS = [
+    ('issue_task_map', 'field_hashes', 'TEXT', None),
+    ('issue_task_map', 'completed', 'INTEGER NOT NULL DEFAULT 0', None),
+    ('issue_task_map', 'issue_updated_at', 'TEXT', None),
+    ('jobs', 'claimed_by', 'TEXT', None),
+    ('jobs', 'claimed_at', 'REAL', None),
+    ('clickup_tasks', 'written_at', 'INTEGER', None),
+    # The changes indexed before were already looked at by the cycle that indexed them
+    ('clickup_tasks', 'checked_at', 'INTEGER NOT NULL DEFAULT 0', 'COALESCE(date_updated, 0)'),
+]
+
+
+def get_connection():
+    """Opens the store for the calling thread on first use, creating and migrating the tables"""
+    global _store_prepared
+    connection = getattr(_local, 'connection', None)
+    if connection is None:
+        connection = sqlite3.connect(sync_db_path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(SCHEMA)
+        _local.connection = connection
+        with _process_lock:
+            if not _store_prepared:
+                with connection:
+                    for table, column, definition, fill in MIGRATIONS:
+                        columns = [row['name'] for row in connection.execute(f'PRAGMA table_info({table})')]
+                        if column not in columns:
+                            connection.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+                            if fill:
+                                connection.execute(f'UPDATE {table} SET {column} = {fill}')
+                _store_prepared = True
+    return connection
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _mapping_row(row):
+    mapping = dict(row)
+    mapping['field_hashes'] = json.loads(mapping['field_hashes']) if mapping['field_hashes'] else None
+    mapping['completed'] = bool(mapping['completed'])
+    return mapping
+
+
+def get_mapping(repo, issue):
+    """Returns the stored mapping row for a github issue, looked up by node_id first and issue number second, or None"""
+    connection = get_connection()
+    row = None
+    if issue.get('node_id'):
+        row = connection.execute(
+            'SELECT * FROM issue_task_map WHERE node_id = ?', (issue['node_id'],)
+        ).fetchone()
+    if row is None:
+        row = connection.execute(
+            'SELECT * FROM issue_task_map WHERE repo = ? AND issue_number = ?', (repo, issue['number'])
+        ).fetchone()
+    return _mapping_row(row) if row else None
+
+
+def get_mapping_by_task_id(repo, task_id):
+    """Returns the stored mapping row of a clickup task or None"""
+    row = get_connection().execute(
+        'SELECT * FROM issue_task_map WHERE repo = ? AND task_id = ?', (repo, task_id)
+    ).fetchone()
+    return _mapping_row(row) if row else None
+
+
+def get_task_id(repo, issue):
+    """Returns the clickup task id mapped to a github issue or None"""
+    mapping = get_mapping(repo, issue)
+    return mapping['task_id'] if mapping else None
+
+
+def save_mapping(repo, issue, task_id, content_hash, field_hashes=None, completed=False):
+    """Stores (or replaces) the clickup task of a github issue with the state last synced to it"""
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO issue_task_map '
+            '(repo, issue_number, node_id, task_id, content_hash, field_hashes, completed, synced_at, issue_updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (repo, issue['number'], issue.get('node_id'), task_id, content_hash,
+             json.dumps(field_hashes) if field_hashes is not None else None, int(completed), _now(),
+             issue.get('updated_at'))
+        )
+
+
+def set_issue_updated_at(repo, issue_number, updated_at):
+    """Records the updated_at of an issue synced without changes for its task"""
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            'UPDATE issue_task_map SET issue_updated_at = ? WHERE repo = ? AND issue_number = ?',
+            (updated_at, repo, issue_number)
+        )
+
+
+def mark_completed(repo, issue_number):
+    """Records that the task of an issue was completed so it is not completed again"""
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            'UPDATE issue_task_map SET completed = 1, synced_at = ? WHERE repo = ? AND issue_number = ?',
+            (_now(), repo, issue_number)
+        )
+
+
+def iter_mappings(repo, completed=None):
+    """Yields every stored mapping of a repository, only the completed or not completed ones when completed is given"""
+    query = 'SELECT * FROM issue_task_map WHERE repo = ?'
+    params = [repo]
+    if completed is not None:
+        query += ' AND completed = ?'
+        params.append(int(completed))
+    rows = get_connection().execute(query, params).fetchall()
+    for row in rows:
+        yield _mapping_row(row)
+
+
+def save_clickup_tasks(list_id, tasks):
+    """Upserts clickup tasks into the local task index, names are stored normalized for title matching"""
+    connection = get_connection()
+    with connection:
+        connection.executemany(
+            'INSERT INTO clickup_tasks (list_id, task_id, name_key, status, date_updated) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT (task_id) DO UPDATE SET list_id = excluded.list_id, name_key = excluded.name_key, '
+            'status = excluded.status, date_updated = MAX(clickup_tasks.date_updated, excluded.date_updated)',
+            [(list_id, task['id'], task['name'].strip().lower(), task.get('status', {}).get('status'),
+              int(task.get('date_updated') or 0)) for task in tasks]
+        )
+
+
+def record_task_write(task_id, written_at):
+    """Records that the sync itself changed an indexed task at written_at (unix time in ms)"""
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            'UPDATE clickup_tasks SET written_at = MAX(COALESCE(written_at, 0), ?) WHERE task_id = ?', (written_at, task_id)
+        )
+
+
+def tasks_changed_in_clickup(list_id):
+    """(task_id, date_updated) of the mapped tasks of a list changed since they were last checked or written by the sync"""
+    rows = get_connection().execute(
+        'SELECT t.task_id, t.date_updated FROM clickup_tasks t JOIN issue_task_map m ON m.task_id = t.task_id '
+        'WHERE t.list_id = ? AND t.date_updated > MAX(t.checked_at, COALESCE(t.written_at, 0))', (list_id,)
+    ).fetchall()
+    return [(row['task_id'], row['date_updated']) for row in rows]
+
+
+def mark_task_checked(task_id, date_updated):
+    """Records that the comments of a task were checked up to its change at date_updated"""
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            'UPDATE clickup_tasks SET checked_at = MAX(checked_at, ?) WHERE task_id = ?', (date_updated, task_id)
+        )
+
+
+def find_clickup_task_by_name(list_id, name):
+    """Returns the indexed clickup task (task_id, status) with this name that is not mapped to an issue yet, or None"""
+    row = get_connection().execute(
+        'SELECT t.task_id, t.status FROM clickup_tasks t LEFT JOIN issue_task_map m ON m.task_id = t.task_id '
+        'WHERE t.list_id = ? AND t.name_key = ? AND m.task_id IS NULL ORDER BY t.date_updated DESC',
+        (list_id, name.strip().lower())
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def get_attachment(url):
+    """Returns the cached attachment entry of an image url, sha256 is None for urls that were skipped"""
+    row = get_connection().execute('SELECT * FROM attachments WHERE url = ?', (url,)).fetchone()
+    return dict(row) if row else None
+
+
+def save_attachment(url, sha256, content_type, size, filename):
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO attachments (url, sha256, content_type, size, filename) VALUES (?, ?, ?, ?, ?)',
+            (url, sha256, content_type, size, filename)
+        )
+
+
+def is_attached(task_id, sha256):
+    """Checks if a file with this content was already uploaded to the clickup task"""
+    return get_connection().execute(
+        'SELECT 1 FROM task_attachments WHERE task_id = ? AND sha256 = ?', (task_id, sha256)
+    ).fetchone() is not None
+
+
+def mark_attached(task_id, sha256):
+    connection = get_connection()
+    with connection:
+        connection.execute('INSERT OR IGNORE INTO task_attachments (task_id, sha256) VALUES (?, ?)', (task_id, sha256))
+
+
+def get_cached_metadata(key):
+    """Returns a cached metadata value, None when it is missing or expired"""
+    row = get_connection().execute(
+        'SELECT value FROM metadata_cache WHERE key = ? AND expires_at > ?', (key, time.time())
+    ).fetchone()
+    return json.loads(row['value']) if row else None
+
+
+def set_cached_metadata(key, value, ttl):
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO metadata_cache (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, json.dumps(value), time.time() + ttl)
+        )
+
+
+def invalidate_metadata(prefix=''):
+    """Drops the cached metadata whose key starts with prefix, everything by default"""
+    connection = get_connection()
+    with connection:
+        connection.execute("DELETE FROM metadata_cache WHERE substr(key, 1, ?) = ?", (len(prefix), prefix))
+
+
+def get_sync_state(key, default=None):
+    """Returns a JSON value from the sync state table"""
+    row = get_connection().execute('SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+    return json.loads(row['value']) if row else default
+
+
+def set_sync_state(key, value):
+    """Stores a JSON value in the sync state table"""
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            'INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)', (key, json.dumps(value))
+        )
+
+
+def acquire_lease(name, owner, ttl):
+    """Takes (or renews) the named lease for ttl seconds, False when another owner holds it and it has not expired"""
+    connection = get_connection()
+    now = time.time()
+    with connection:
+        acquired = connection.execute(
+            'INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at '
+            'WHERE leases.owner = excluded.owner OR leases.expires_at < ?',
+            (name, owner, now + ttl, now)
+        ).rowcount
+    return acquired == 1
+
+
+def release_lease(name, owner):
+    connection = get_connection()
+    with connection:
+        connection.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+
+
+# Durable work queue, every side effect of a sync (create task, upload attachment, notify, comment) is a job
+# with an idempotency key so a crashed or failed run resumes where it stopped without repeating finished work.
+# A running job is claimed by its worker for a number of seconds, the job of a worker that crashed is taken over
+# once its claim expired while the jobs of live processes sharing the store are left alone
+
+def _job_row(row):
+    job = dict(row)
+    job['payload'] = json.loads(job['payload'])
+    job['result'] = json.loads(job['result']) if job['result'] is not None else None
+    return job
+
+
+def enqueue_job(job_key, kind, payload):
+    """Adds a pending job unless one with the same key exists, a failed job is only made pending again for a new payload"""
+    connection = get_connection()
+    payload = json.dumps(payload)
+    with connection:
+        connection.execute(
+            'INSERT OR IGNORE INTO jobs (job_key, kind, payload, updated_at) VALUES (?, ?, ?, ?)',
+            (job_key, kind, payload, _now())
+        )
+        connection.execute(
+            "UPDATE jobs SET status = 'pending', attempts = 0, payload = ?, updated_at = ? "
+            "WHERE job_key = ? AND status = 'failed' AND payload != ?",
+            (payload, _now(), job_key, payload)
+        )
+
+
+def retry_failed_jobs():
+    """Makes every job that failed for good pending again, returns how many"""
+    connection = get_connection()
+    with connection:
+        return connection.execute(
+            "UPDATE jobs SET status = 'pending', attempts = 0, updated_at = ? WHERE status = 'failed'", (_now(),)
+        ).rowcount
+
+
+def get_job(job_key):
+    row = get_connection().execute('SELECT * FROM jobs WHERE job_key = ?', (job_key,)).fetchone()
+    return _job_row(row) if row else None
+
+
+def claim_job(job_key, owner, ttl):
+    """Marks a pending job (or a running one whose claim expired) as running by owner and returns it, None otherwise"""
+    connection = get_connection()
+    now = time.time()
+    with connection:
+        claimed = connection.execute(
+            "UPDATE jobs SET status = 'running', claimed_by = ?, claimed_at = ?, updated_at = ? WHERE job_key = ? "
+            "AND (status = 'pending' OR (status = 'running' AND (claimed_at IS NULL OR claimed_at < ?)))",
+            (owner, now, _now(), job_key, now - ttl)
+        ).rowcount
+    return get_job(job_key) if claimed else None
+
+
+def complete_job(job_key, result=None, follow_up_jobs=()):
+    """Marks a job done with its result and, in the same transaction, enqueues the (job_key, kind, payload) follow ups"""
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            "UPDATE jobs SET status = 'done', result = ?, last_error = NULL, updated_at = ? WHERE job_key = ?",
+            (json.dumps(result), _now(), job_key)
+        )
+        connection.executemany(
+            'INSERT OR IGNORE INTO jobs (job_key, kind, payload, updated_at) VALUES (?, ?, ?, ?)',
+            [(key, kind, json.dumps(payload), _now()) for key, kind, payload in follow_up_jobs]
+        )
+
+
+def fail_job(job_key, error, max_attempts):
+    """Records a failed attempt, the job stays pending until it has failed max_attempts times"""
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            "UPDATE jobs SET attempts = attempts + 1, last_error = ?, updated_at = ?, "
+            "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END WHERE job_key = ?",
+            (str(error), _now(), max_attempts, job_key)
+        )
+
+
+def release_job(job_key):
+    """Puts a running job back to pending without counting an attempt, for a run that was interrupted"""
+    connection = get_connection()
+    with connection:
+        connection.execute(
+            "UPDATE jobs SET status = 'pending', claimed_by = NULL, claimed_at = NULL, updated_at = ? "
+            "WHERE job_key = ? AND status = 'running'", (_now(), job_key)
+        )
+
+
+def pending_job_keys(ttl):
+    """Keys of the pending jobs and of the running ones whose claim is older than ttl seconds, in the order they were enqueued"""
+    rows = get_connection().execute(
+        "SELECT job_key FROM jobs WHERE status = 'pending' "
+        "OR (status = 'running' AND (claimed_at IS NULL OR claimed_at < ?)) ORDER BY rowid",
+        (time.time() - ttl,)
+    ).fetchall()
+    return [row['job_key'] for row in rows]
@@ -0,0 +1,151 @@
+import hmac
+import json
+import hashlib
+import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from github_issues_config import (
+    github_webhook_secret, webhook_port, reconcile_interval_hours, sync_concurrency, metrics_port
+)
+from github_issues_client import shutdown_event
+from github_issues_metrics import metrics, serve_metrics, configure_logging
+from github_issues_store import get_task_id
+import github_issues_main as sync
+
+# Event driven sync: github posts `issues` and `issue_comment` webhooks here and only the issue in the event is synced.
+# The full sync runs when the server starts and then every reconcile_interval_hours to catch events that were missed
+# while the server was down, with a listing of the open issues for the deliveries of deleted issues.
+
+logger = logging.getLogger(__name__)
+
+SYNCED_ISSUE_ACTIONS = {'opened', 'edited', 'closed', 'reopened', 'labeled', 'unlabeled'}
+
+# Events for one issue are handled one after another, events for different issues in parallel. Neither the lock nor
+# github keep the delivery order, a payload older than the state last synced to the task is skipped (sync_issue).
+# Deliveries of every configured route can come to the same server, the repository of the event picks the route
+_issue_locks = defaultdict(threading.Lock)
+_issue_locks_guard = threading.Lock()
+_executor = ThreadPoolExecutor(max_workers=sync_concurrency)
+
+
+def verify_signature(body, signature_header):
+    """Checks the X-Hub-Signature-256 header against the HMAC-SHA256 of the body with the webhook secret"""
+    if not signature_header or not signature_header.startswith('sha256='):
+        return False
+    expected = hmac.new(github_webhook_secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(signature_header[len('sha256='):], expected)
+
+
+def issue_lock(repo, issue_number):
+    with _issue_locks_guard:
+        return _issue_locks[(repo, issue_number)]
+
+
+def handle_event(event, payload):
+    """Routes one webhook event to the create/update/comment handler of its issue"""
+    repository = payload.get('repository', {}).get('full_name', '')
+    route = sync.route_for_repo(repository)
+    if route is None:
+        logger.debug(f"Ignoring {event} event for {repository}")
+        return
+    action = payload.get('action')
+    issue = payload['issue']
+    if 'pull_request' in issue:
+        return
+    with issue_lock(route['repo'], issue['number']):
+        if event == 'issues' and action in SYNCED_ISSUE_ACTIONS:
+            logger.debug(f"Webhook: issue #{issue['number']} {action}")
+            sync.sync_single_issue(route, issue)
+        elif event == 'issues' and action == 'deleted':
+            logger.debug(f"Webhook: issue #{issue['number']} deleted")
+            sync.complete_deleted_issue(route, issue)
+        elif event == 'issue_comment' and action == 'created':
+            task_id = get_task_id(route['repo'], issue)
+            if task_id is None:
+                sync.sync_single_issue(route, issue)
+                task_id = get_task_id(route['repo'], issue)
+            if task_id:
+                sync.mirror_github_comment(task_id, payload['comment'])
+
+
+def process_event(event, payload):
+    try:
+        with metrics.timer('webhook_event_duration_seconds', event=event):
+            handle_event(event, payload)
+        metrics.inc('webhook_events_total', event=event, outcome='handled')
+    except Exception as e:
+        metrics.inc('webhook_events_total', event=event, outcome='failed')
+        logger.warning(f"Failed to handle {event} webhook: {e}")
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Accepts github webhook deliveries, answers right away and syncs in the background"""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not verify_signature(body, self.headers.get('X-Hub-Signature-256')):
+            self.send_response(401)
+            self.end_headers()
+            return
+        event = self.headers.get('X-GitHub-Event')
+        if event == 'ping':
+            self.send_response(200)
+            self.end_headers()
+            return
+        if event not in ('issues', 'issue_comment'):
+            self.send_response(204)
+            self.end_headers()
+            return
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        _executor.submit(process_event, event, payload)
+        self.send_response(202)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def reconcile_periodically(stop_event):
+    """Runs the reconciliation sync right away and then every reconcile_interval_hours: the issues updated since the
+    last sync and a listing of the open issues to complete the tasks of deleted ones"""
+    while not stop_event.is_set():
+        try:
+            sync.sync_github_to_clickup(stop_event=stop_event, check_open_issues=True)
+        except Exception as e:
+            logger.error(f"Reconciliation sync failed, retrying in {reconcile_interval_hours} hour(s): {e}")
+        stop_event.wait(reconcile_interval_hours * 3600)
+
+
+def serve(port=webhook_port):
+    """Starts the webhook server and reconciles in the background, the first reconciliation runs while deliveries
+    are already accepted since github does not redeliver the ones refused during a long initial sync"""
+    if not github_webhook_secret:
+        raise SystemExit('github_webhook_secret must be set to verify webhook signatures')
+    if metrics_port:
+        serve_metrics(metrics_port)
+    stop_event = threading.Event()
+    server = ThreadingHTTPServer(('', port), WebhookHandler)
+    logger.info(f"Listening for github webhooks on port {port}")
+    threading.Thread(target=reconcile_periodically, args=(stop_event,), daemon=True).start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_event.set()
+        shutdown_event.set()
+        server.server_close()
+        _executor.shutdown(wait=True)
+        sync.slack_notifier.flush()
+
+
+if __name__ == '__main__':
+    configure_logging()
+    serve()
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+# The modules are flat files in the repository root and github_issues_config reads its json from the working directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+
+class FakeClock:
+    """Stands in for the time module of the code under test, sleeping advances it"""
+
+    def __init__(self, now=1700000000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,105 @@
+import io
+
+import pytest
+import requests
+
+import github_issues_client as client
+
+
+def make_response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    return response
+
+
+@pytest.fixture
+def fake_time(monkeypatch, clock):
+    monkeypatch.setattr(client, 'time', clock)
+    return clock
+
+
+def test_retry_delay_prefers_retry_after():
+    response = make_response(429, {'Retry-After': '7', 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': '0'})
+    assert client.retry_delay(response, 0) == 7
+
+
+def test_retry_delay_waits_for_the_rate_limit_reset(fake_time):
+    reset = fake_time.now + 120
+    response = make_response(403, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)})
+    assert client.retry_delay(response, 0) == 120
+    fake_time.advance(200)
+    assert client.retry_delay(response, 0) == 1
+
+
+@pytest.mark.parametrize('attempt', [0, 3, 10])
+def test_retry_delay_backs_off_within_the_cap(attempt):
+    for _ in range(20):
+        assert 0 <= client.retry_delay(None, attempt) <= min(client.MAX_BACKOFF, 2 ** attempt)
+
+
+@pytest.mark.parametrize('status, headers, idempotent, expected', [
+    (429, {}, False, True),
+    (503, {}, False, True),
+    (502, {}, False, False),
+    (502, {}, True, True),
+    (500, {}, True, True),
+    (403, {}, True, False),
+    (403, {'X-RateLimit-Remaining': '0'}, False, True),
+    (403, {'Retry-After': '60'}, False, True),
+    (404, {}, True, False),
+    (200, {}, True, False),
+])
+def test_should_retry(status, headers, idempotent, expected):
+    assert client.should_retry(idempotent, make_response(status, headers)) is expected
+
+
+def read_in_chunks(body, size=-1):
+    data = b''
+    while True:
+        chunk = body.read(size)
+        if not chunk:
+            return data
+        data += chunk
+
+
+def test_multipart_body_framing():
+    content = b'\x89PNG' + bytes(range(256)) * 10
+    body = client.MultipartFileBody('attachment', 'shot.png', io.BytesIO(content), len(content), 'image/png')
+    boundary = body.content_type.split('boundary=')[1]
+    expected = (
+        f'--{boundary}\r\n'
+        'Content-Disposition: form-data; name="attachment"; filename="shot.png"\r\n'
+        'Content-Type: image/png\r\n\r\n'
+    ).encode('utf-8') + content + f'\r\n--{boundary}--\r\n'.encode('utf-8')
+    assert body.content_type.startswith('multipart/form-data; boundary=')
+    assert len(body) == len(expected)
+    assert read_in_chunks(body, 7) == expected
+    body.seek(0)
+    assert read_in_chunks(body) == expected
+
+
+def test_rate_limiter_paces_to_the_budget(fake_time):
+    limiter = client.RateLimiter(2, 10)
+    started = fake_time.now
+    for _ in range(3):
+        limiter.acquire()
+    assert fake_time.now - started == pytest.approx(5, abs=0.01)
+
+
+def test_rate_limiter_follows_the_remaining_budget(fake_time):
+    limiter = client.RateLimiter(100, 100)
+    limiter.update(make_response(200, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(fake_time.now + 50)}))
+    assert limiter.seconds_until_available(0.5) == pytest.approx(50)
+    started = fake_time.now
+    limiter.acquire()
+    assert fake_time.now - started == pytest.approx(50, abs=0.01)
+
+
+def test_rate_limiter_wait_stops_on_the_stop_event(fake_time):
+    limiter = client.RateLimiter(1, 3600)
+    limiter.acquire()
+    stop_event = client.threading.Event()
+    stop_event.set()
+    with pytest.raises(client.RequestsStopped):
+        limiter.acquire(stop_event)
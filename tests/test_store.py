@@ -0,0 +1,127 @@
+import threading
+
+import pytest
+
+import github_issues_store as store
+
+
+@pytest.fixture(autouse=True)
+def temp_store(tmp_path, monkeypatch, clock):
+    """A fresh store file and fake clock per test"""
+    monkeypatch.setattr(store, 'sync_db_path', str(tmp_path / 'sync.db'))
+    monkeypatch.setattr(store, '_local', threading.local())
+    monkeypatch.setattr(store, '_store_prepared', False)
+    monkeypatch.setattr(store, 'time', clock)
+    yield
+    connection = getattr(store._local, 'connection', None)
+    if connection is not None:
+        connection.close()
+
+
+def test_claim_job_runs_a_pending_job_once():
+    store.enqueue_job('job', 'kind', {'a': 1})
+    job = store.claim_job('job', 'worker-1', ttl=60)
+    assert job['status'] == 'running'
+    assert job['claimed_by'] == 'worker-1'
+    assert job['payload'] == {'a': 1}
+    assert store.claim_job('job', 'worker-2', ttl=60) is None
+
+
+def test_claim_of_a_crashed_worker_is_taken_over_once_expired(clock):
+    store.enqueue_job('job', 'kind', {})
+    store.claim_job('job', 'worker-1', ttl=60)
+    clock.advance(59)
+    assert store.claim_job('job', 'worker-2', ttl=60) is None
+    assert store.pending_job_keys(ttl=60) == []
+    clock.advance(2)
+    assert store.pending_job_keys(ttl=60) == ['job']
+    assert store.claim_job('job', 'worker-2', ttl=60)['claimed_by'] == 'worker-2'
+
+
+def test_done_job_is_not_claimed_again_and_queues_its_follow_ups():
+    store.enqueue_job('job', 'kind', {})
+    store.claim_job('job', 'worker', ttl=60)
+    store.complete_job('job', {'id': 'task'}, [('follow-up', 'other', {'b': 2})])
+    assert store.get_job('job')['status'] == 'done'
+    assert store.get_job('job')['result'] == {'id': 'task'}
+    assert store.claim_job('job', 'worker', ttl=60) is None
+    assert store.pending_job_keys(ttl=60) == ['follow-up']
+
+
+def test_fail_job_leaves_the_job_failed_at_the_attempt_limit():
+    store.enqueue_job('job', 'kind', {'a': 1})
+    for attempt in range(1, 3):
+        store.claim_job('job', 'worker', ttl=60)
+        store.fail_job('job', 'boom', max_attempts=3)
+        assert store.get_job('job')['status'] == 'pending'
+        assert store.get_job('job')['attempts'] == attempt
+    store.claim_job('job', 'worker', ttl=60)
+    store.fail_job('job', 'boom', max_attempts=3)
+    job = store.get_job('job')
+    assert (job['status'], job['attempts'], job['last_error']) == ('failed', 3, 'boom')
+    assert store.claim_job('job', 'worker', ttl=60) is None
+    assert store.pending_job_keys(ttl=60) == []
+
+
+def test_failed_job_is_only_rearmed_by_a_new_payload_or_retry_failed_jobs():
+    store.enqueue_job('job', 'kind', {'a': 1})
+    store.claim_job('job', 'worker', ttl=60)
+    store.fail_job('job', 'boom', max_attempts=1)
+    store.enqueue_job('job', 'kind', {'a': 1})
+    assert store.get_job('job')['status'] == 'failed'
+    store.enqueue_job('job', 'kind', {'a': 2})
+    job = store.get_job('job')
+    assert (job['status'], job['attempts'], job['payload']) == ('pending', 0, {'a': 2})
+    store.claim_job('job', 'worker', ttl=60)
+    store.fail_job('job', 'boom', max_attempts=1)
+    assert store.retry_failed_jobs() == 1
+    assert store.get_job('job')['status'] == 'pending'
+
+
+def test_release_job_does_not_count_an_attempt():
+    store.enqueue_job('job', 'kind', {})
+    store.claim_job('job', 'worker-1', ttl=60)
+    store.release_job('job')
+    job = store.get_job('job')
+    assert (job['status'], job['attempts'], job['claimed_by']) == ('pending', 0, None)
+    assert store.claim_job('job', 'worker-2', ttl=60) is not None
+
+
+def test_lease_is_held_renewed_and_taken_over_once_expired(clock):
+    assert store.acquire_lease('sync', 'a', ttl=30)
+    assert not store.acquire_lease('sync', 'b', ttl=30)
+    clock.advance(20)
+    assert store.acquire_lease('sync', 'a', ttl=30)   # renewed until now + 30
+    clock.advance(20)
+    assert not store.acquire_lease('sync', 'b', ttl=30)
+    clock.advance(11)
+    assert store.acquire_lease('sync', 'b', ttl=30)
+    assert not store.acquire_lease('sync', 'a', ttl=30)
+
+
+def test_released_lease_is_free():
+    assert store.acquire_lease('sync', 'a', ttl=30)
+    store.release_lease('sync', 'b')
+    assert not store.acquire_lease('sync', 'b', ttl=30)
+    store.release_lease('sync', 'a')
+    assert store.acquire_lease('sync', 'b', ttl=30)
+
+
+def test_tasks_changed_in_clickup_skips_the_sync_writes_and_checked_changes():
+    issue = {'number': 1, 'node_id': 'I_1', 'updated_at': '2026-01-01T00:00:00Z'}
+    store.save_mapping('o/r', issue, 't1', 'hash')
+    store.save_clickup_tasks('list', [{'id': 't1', 'name': 'Task', 'date_updated': '1000'}])
+    assert store.tasks_changed_in_clickup('list') == [('t1', 1000)]
+    store.record_task_write('t1', 1000)
+    assert store.tasks_changed_in_clickup('list') == []
+    store.save_clickup_tasks('list', [{'id': 't1', 'name': 'Task', 'date_updated': '2000'}])
+    assert store.tasks_changed_in_clickup('list') == [('t1', 2000)]
+    store.mark_task_checked('t1', 2000)
+    assert store.tasks_changed_in_clickup('list') == []
+
+
+def test_mapped_task_is_not_found_by_title_again():
+    store.save_clickup_tasks('list', [{'id': 't1', 'name': ' Same Title ', 'date_updated': '1'}])
+    assert store.find_clickup_task_by_name('list', 'same title')['task_id'] == 't1'
+    store.save_mapping('o/r', {'number': 1, 'node_id': 'I_1'}, 't1', 'hash')
+    assert store.find_clickup_task_by_name('list', 'Same Title') is None